@@ -0,0 +1,164 @@
+from WGF.common import Point, ConvertableType
+import WGF
+import logging
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError(
+        "WGF.arrays requires numpy. Install it with: pip install WGF[numpy_support]"
+    ) from e
+
+log = logging.getLogger(__name__)
+
+# Array-backed storage of positions, that can be shared by anything that needs
+# to move lots of entities at once (groups, particles, tilemaps) - so per-entity
+# math happens inside numpy, instead of python's interpreter
+
+
+class PointArray:
+    """Growable array of 2d positions with vectorized transformations.
+    Removal moves the last point into the freed slot, thus indices of points are
+    only stable until something gets removed.
+    """
+
+    def __init__(self, points: list = (), capacity: int = 16, dtype=np.float64):
+        points = np.asarray([tuple(i) for i in points], dtype=dtype).reshape(-1, 2)
+        self.count = len(points)
+        self._data = np.zeros((max(capacity, self.count, 1), 2), dtype=dtype)
+        self._data[: self.count] = points
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({self.count} points)"
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for x, y in self.points.tolist():
+            yield Point(x, y)
+
+    def __getitem__(self, index: int) -> Point:
+        x, y = self.points[index].tolist()
+        return Point(x, y)
+
+    def __setitem__(self, index: int, point: Point):
+        self.points[index] = tuple(point)
+
+    @property
+    def points(self) -> np.ndarray:
+        """Writable (count, 2) view of stored positions"""
+        return self._data[: self.count]
+
+    @property
+    def xs(self) -> np.ndarray:
+        return self._data[: self.count, 0]
+
+    @property
+    def ys(self) -> np.ndarray:
+        return self._data[: self.count, 1]
+
+    def _reserve(self, count: int):
+        if count <= len(self._data):
+            return
+        # Growing geometrically, so appends stay amortized O(1)
+        data = np.zeros((max(count, len(self._data) * 2), 2), dtype=self._data.dtype)
+        data[: self.count] = self.points
+        self._data = data
+
+    def append(self, point: Point) -> int:
+        """Add point and get its index"""
+        self._reserve(self.count + 1)
+        self._data[self.count] = tuple(point)
+        self.count += 1
+        return self.count - 1
+
+    def extend(self, points: list) -> range:
+        """Add multiple points and get range of their indices"""
+        points = np.asarray([tuple(i) for i in points], dtype=self._data.dtype)
+        start = self.count
+        self._reserve(start + len(points))
+        self._data[start : start + len(points)] = points.reshape(-1, 2)
+        self.count += len(points)
+        return range(start, self.count)
+
+    def remove(self, index: int) -> int:
+        """Remove point by moving the last one into its place.
+        Returns previous index of moved point, or None if nothing has been moved.
+        """
+
+        if not -self.count <= index < self.count:
+            raise IndexError(index)
+        index %= self.count
+        last = self.count - 1
+        self.count = last
+        if index == last:
+            return None
+        self._data[index] = self._data[last]
+        return last
+
+    def clear(self):
+        self.count = 0
+
+    def translate(self, offset):
+        """Move all points by offset. It can be a single (x, y) pair, or an
+        array of per-point offsets (say, velocities multiplied by frame's time)
+        """
+        if isinstance(offset, ConvertableType):
+            offset = offset.to_tuple()
+        self._data[: self.count] += np.asarray(offset)
+        return self
+
+    def scale(self, factor: float, origin: Point = (0, 0)):
+        """Scale distance of all points from origin"""
+        points = self.points
+        origin = np.asarray(tuple(origin), dtype=points.dtype)
+        points -= origin
+        points *= factor
+        points += origin
+        return self
+
+    def screen_positions(self, distance=0.0, camera_pos: Point = None) -> np.ndarray:
+        """Get positions offset by camera, same way VisualNode.pos does.
+        Distance can be either shared by all points, or an array of per-point ones.
+        """
+
+        distance = np.asarray(distance, dtype=self._data.dtype)
+        if not distance.any():
+            return self.points.copy()
+        camera = np.asarray(tuple(camera_pos or WGF.camera.pos), self._data.dtype)
+        if distance.ndim:
+            return self.points + distance[:, None] * camera
+        return self.points + camera * distance
+
+    def rect_coords(
+        self,
+        sizes,
+        align=None,
+        distance=0.0,
+        camera_pos: Point = None,
+    ) -> np.ndarray:
+        """Get integer topleft coordinates of rects of provided (width, height)
+        sizes, positioned at these points with provided align (center by default)
+        """
+
+        from WGF.nodes import Align
+
+        # Truncating towards zero, the way int() in VisualNode.pos does
+        coords = np.trunc(self.screen_positions(distance, camera_pos))
+        coords = coords.astype(np.int64)
+        sizes = np.asarray(sizes, dtype=np.int64).reshape(-1, 2)
+        if align is Align.topleft:
+            return coords
+        if align is Align.topright:
+            coords[:, 0] -= sizes[:, 0]
+            return coords
+        return coords - sizes // 2
+
+    def update_rects(self, rects: list, align=None, distance=0.0, camera_pos=None):
+        """Move provided rects (one per point) into their positions"""
+
+        sizes = [rect.size for rect in rects]
+        coords = self.rect_coords(sizes, align, distance, camera_pos)
+        for rect, topleft in zip(rects, coords.tolist()):
+            rect.topleft = topleft
@@ -0,0 +1,136 @@
+from pygame import mixer
+from collections import namedtuple
+from os.path import getsize
+import logging
+
+log = logging.getLogger(__name__)
+
+# Long audio (say, music) is played through pygame.mixer.music, which streams it
+# from disk, instead of decoding the whole file into memory like mixer.Sound does
+
+QueuedTrack = namedtuple("QueuedTrack", ["music", "loops", "fade_ms"])
+
+
+class Music:
+    """Audio file that should be streamed, instead of being fully decoded.
+    Mimics some of mixer.Sound's interface, so both can be used the same way.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = getsize(path)
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({self.path})"
+
+    def play(self, loops: int = 0, fade_ms: int = 0):
+        music_player.play(self, loops=loops, fade_ms=fade_ms)
+
+    def stop(self):
+        if music_player.current is self:
+            music_player.stop()
+
+    def fadeout(self, time: int):
+        if music_player.current is self:
+            music_player.stop(fade_ms=time)
+
+
+class MusicPlayer:
+    """Player of streamed audio, with support for queue and crossfades.
+    Requires its update() to be called each frame.
+    """
+
+    def __init__(self):
+        self.queue = []
+        self.current = None
+        self.paused = False
+        # Track that should start once current one fades out
+        self._pending = None
+
+    def _start(self, track: QueuedTrack):
+        log.debug(f"Playing {track.music.path}")
+        mixer.music.load(track.music.path)
+        mixer.music.play(loops=track.loops, fade_ms=track.fade_ms)
+        self.current = track.music
+        self.paused = False
+
+    @property
+    def busy(self) -> bool:
+        return mixer.music.get_busy()
+
+    def play(self, music: Music, loops: int = 0, fade_ms: int = 0):
+        """Play provided music right away, dropping the current one"""
+
+        self._pending = None
+        self._start(QueuedTrack(music, loops, fade_ms))
+
+    def enqueue(self, music: Music, loops: int = 0, fade_ms: int = 0):
+        """Add music to the queue. If nothing is playing, it will start on update"""
+
+        self.queue.append(QueuedTrack(music, loops, fade_ms))
+
+    def crossfade(self, music: Music, fade_ms: int = 1000, loops: int = 0):
+        """Fade out current music, then fade in the provided one.
+        Since mixer.music has single stream, these dont overlap.
+        """
+
+        track = QueuedTrack(music, loops, fade_ms)
+        if not self.busy:
+            self._start(track)
+            return
+        self._pending = track
+        mixer.music.fadeout(fade_ms)
+
+    def skip(self, fade_ms: int = 0):
+        """Switch to the next queued music"""
+
+        if not self.queue:
+            self.stop(fade_ms)
+            return
+        track = self.queue.pop(0)
+        if fade_ms:
+            self.crossfade(track.music, fade_ms=fade_ms, loops=track.loops)
+        else:
+            self._start(track)
+
+    def stop(self, fade_ms: int = 0, clear: bool = True):
+        """Stop current music. Unless clear is False, queued music is dropped
+        too - otherwise next update would start it.
+        """
+
+        self._pending = None
+        if clear:
+            self.queue.clear()
+        if fade_ms:
+            mixer.music.fadeout(fade_ms)
+        else:
+            mixer.music.stop()
+        self.current = None
+        self.paused = False
+
+    def pause(self):
+        mixer.music.pause()
+        self.paused = True
+
+    def resume(self):
+        mixer.music.unpause()
+        self.paused = False
+
+    def update(self):
+        """Start pending or queued music, once current one ends"""
+
+        # Paused music isnt considered busy, so it needs to be checked separately
+        if not mixer.get_init() or self.paused or self.busy:
+            return
+
+        if self._pending:
+            track = self._pending
+            self._pending = None
+            self._start(track)
+        elif self.queue:
+            self._start(self.queue.pop(0))
+        else:
+            self.current = None
+
+
+music_player = MusicPlayer()
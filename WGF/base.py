@@ -1,8 +1,11 @@
+import os
 import pygame
 from operator import ior
 from functools import reduce
 from enum import Enum
-from time import sleep
+from time import sleep, perf_counter
+import json
+import weakref
 import WGF
 
 # Importing local pygame vars (usually in caps), without which "while True" fails
@@ -35,6 +38,92 @@ class EventHandler:
         self.events = pygame.event.get()
 
 
+def _event_to_dict(event: pygame.event.Event) -> dict:
+    return {"type": event.type, "dict": event.dict}
+
+
+def _event_from_dict(data: dict) -> pygame.event.Event:
+    # Json turns tuples (say, positions) into lists
+    attrs = {k: tuple(v) if isinstance(v, list) else v for k, v in data["dict"].items()}
+    return pygame.event.Event(data["type"], attrs)
+
+
+class RecordingEventHandler(EventHandler):
+    """Event handler that remembers events of each frame, to replay them later"""
+
+    def __init__(self):
+        self.frames = []
+
+    def update(self):
+        super().update()
+        self.frames.append(self.events)
+
+    def save(self, path):
+        """Dump recorded events into provided json file"""
+
+        data = [[_event_to_dict(e) for e in frame] for frame in self.frames]
+        with open(path, "w") as f:
+            # Events may contain things json knows nothing about, like windows
+            json.dump(data, f, default=str)
+
+
+class PlaybackEventHandler(EventHandler):
+    """Event handler that feeds recorded events instead of real ones, one
+    frame at a time. Once recording ends, no more events get produced.
+    """
+
+    def __init__(self, frames: list):
+        self.frames = list(frames)
+        self.frame = 0
+
+    @classmethod
+    def from_file(cls, path):
+        """Load events saved by RecordingEventHandler"""
+
+        with open(path) as f:
+            data = json.load(f)
+        return cls([[_event_from_dict(e) for e in frame] for frame in data])
+
+    @property
+    def finished(self) -> bool:
+        return self.frame >= len(self.frames)
+
+    def update(self):
+        if self.finished:
+            self.events = []
+            return
+        self.events = self.frames[self.frame]
+        self.frame += 1
+
+
+class FixedClock:
+    """Clock that advances by fixed amount of ms each tick, without ever waiting.
+    Used to run simulations as fast as possible, while keeping them determined.
+    """
+
+    def __init__(self, dt: int = 16):
+        self.dt = dt
+        self._time = 0
+        # Total amount of simulated ms and frames
+        self.elapsed = 0
+        self.frames = 0
+
+    def tick(self, framerate: int = 0) -> int:
+        self._time = self.dt
+        self.elapsed += self.dt
+        self.frames += 1
+        return self.dt
+
+    def get_time(self) -> int:
+        return self._time
+
+    def get_rawtime(self) -> int:
+        return self._time
+
+    def get_fps(self) -> float:
+        return 1000 / self.dt if self.dt else 0.0
+
+
 class Camera:
     """Simple camera node"""
 
@@ -43,6 +132,10 @@ class Camera:
 
 
 class NodeBase:
+    # Weak reference to node this one is attached to. Weak, so detached subtrees
+    # (say, stopped scenes) dont keep each other alive
+    _parent_ref = None
+
     def __init__(self, name):
         self.name = name
         self._children = {}
@@ -50,8 +143,14 @@ class NodeBase:
     def __repr__(self):
         return f"{type(self).__name__}"
 
+    @property
+    def parent(self):
+        """Node this one is attached to, if any"""
+        return self._parent_ref() if self._parent_ref is not None else None
+
     def add_child(self, node, name: str = None, show: bool = True):
         # if isinstance(node, Node):
+        node._parent_ref = weakref.ref(self)
         node.init()
         if show:
             node.show()
@@ -78,7 +177,8 @@ class NodeBase:
             yield var, self._children[var]
 
     def __delitem__(self, key):
-        del self._children[key]
+        node = self._children.pop(key)
+        node._parent_ref = None
 
 
 class SceneTree(NodeBase):
@@ -87,13 +187,64 @@ class SceneTree(NodeBase):
         self.draw_list = []
 
     def update(self):
+        self.update_nodes()
+        self.draw()
+
+    def update_nodes(self):
+        """Update attached nodes, collecting these that should be drawn"""
         self.draw_list = []
         for item in self._children.values():
             item.update()
 
+    def draw(self):
         for i in self.draw_list:
             i.draw()
 
+    def switch(self, scene, name: str = None, stop: bool = True) -> float:
+        """Replace currently attached scenes with provided one. Other nodes
+        (say, cursor) remain in place. Returns time it took, in ms.
+        """
+
+        from WGF.nodes import Scene
+
+        start = perf_counter()
+        for key, node in tuple(self._children.items()):
+            if node is scene or not isinstance(node, Scene):
+                continue
+            if stop:
+                node.stop()
+                del self[key]
+            else:
+                node.hide()
+
+        # Preloaded scenes are already initialized, so this is but a swap
+        self.add_child(scene, name=name)
+        return (perf_counter() - start) * 1000
+
+
+def is_reachable(node, known: dict) -> bool:
+    """Check if node is attached to scene tree via active ancestors.
+    Known is a cache of already visited parents, which siblings can share.
+    """
+
+    path = []
+    parent = node.parent
+    result = False
+    while parent is not None:
+        if parent in known:
+            result = known[parent]
+            break
+        path.append(parent)
+        if isinstance(parent, SceneTree):
+            result = True
+            break
+        if not parent.active:
+            break
+        parent = parent.parent
+    for item in path:
+        known[item] = result
+    return result
+
 
 class GameContext:
     def __init__(self, cls):
@@ -216,8 +367,21 @@ class GameWindow:
     tree = None
     event_handler = None
     camera = None
+    # Frame profiler. If not set, frames arent timed at all
+    profiler = None
+    # Game's clock. If not set, FixedClock is used in headless mode and pygame's
+    # clock otherwise
+    clock = None
+    # If disabled, headless games dont draw anything at all
+    headless_draw: bool = True
+
+    def __init__(self, title: str = "My Game", headless: bool = False):
+        # Headless games never open real window, drawing to offscreen surface
+        self.headless = headless
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
 
-    def __init__(self, title: str = "My Game"):
         log.debug("Initializing pygame")
         pygame.init()
 
@@ -235,7 +399,8 @@ class GameWindow:
 
         # We configuring stuff like that because user could override things manually
         # fps shenanigans
-        self.clock = pygame.time.Clock()
+        if not self.clock:
+            self.clock = FixedClock() if self.headless else pygame.time.Clock()
 
         # Assets loader. I may want to change names l8r #TODO
         if not self.assets:
@@ -273,11 +438,17 @@ class GameWindow:
         WGF.tree = self.tree
         WGF.clock = self.clock
 
-        from WGF.tasks import TaskManager
+        from WGF.tasks import TaskManager, AnimationManager
 
         self.task_mgr = TaskManager()
+        self.anim_mgr = AnimationManager()
 
         WGF.task_mgr = self.task_mgr
+        WGF.anim_mgr = self.anim_mgr
+
+        from WGF.audio import music_player
+
+        self.music_player = music_player
 
         self.initialized = True
 
@@ -323,29 +494,101 @@ class GameWindow:
     def exit(self):
         self.active = False
         log.info("Closing the game. Bye :(")
-        sleep(0.5)
+        if not self.headless:
+            sleep(0.5)
         pygame.quit()
 
-    def run(self):
-        """Run the updater routine. Can only be used once"""
+    def enable_profiler(self, size: int = 600, budget_ms: float = None):
+        """Start timing each phase of frames. Returns profiler"""
+
+        from WGF.profiler import FrameProfiler
+
+        if budget_ms is None and self.clock_speed:
+            budget_ms = 1000 / self.clock_speed
+        self.profiler = FrameProfiler(size=size, budget_ms=budget_ms)
+        return self.profiler
+
+    def disable_profiler(self):
+        self.profiler = None
+
+    def _handle_events(self):
+        self.event_handler.update()
+        for event in self.event_handler.events:
+            if event.type == pgl.QUIT:
+                self.active = False
+
+    def _update_animations(self):
+        # All animations are advanced from single clock sample. Surfaces only
+        # get swapped on nodes which frame has actually changed
+        for node in self.anim_mgr.update():
+            node.update_frame()
+        # Starts queued music once previous track ends
+        self.music_player.update()
+
+    def _draw(self):
+        if self.headless:
+            if self.headless_draw:
+                self.tree.draw()
+            return
+        self.tree.draw()
+        # This will update whats visible on screen to player
+        self.window.flip()
+
+    def _frame(self):
+        self.clock.tick(self.clock_speed)
+        # Keep in mind that this instance of task manager runs each frame.
+        # If there is custom pause implementation that require manager to be
+        # paused, its encouraged to create new one on local scene's level
+        self.task_mgr.update()
+        self._update_animations()
+        self._handle_events()
+        self.tree.update_nodes()
+        self._draw()
+
+    def _profiled_frame(self):
+        # Same as _frame, but with each phase being timed
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.clock.tick(self.clock_speed)
+        profiler.mark("tick")
+        self.task_mgr.update()
+        profiler.mark("tasks")
+        self._update_animations()
+        profiler.mark("animations")
+        self._handle_events()
+        profiler.mark("events")
+        self.tree.update_nodes()
+        profiler.mark("update")
+        if self.headless:
+            self._draw()
+            profiler.mark("draw")
+        else:
+            self.tree.draw()
+            profiler.mark("draw")
+            self.window.flip()
+        profiler.mark("flip")
+        profiler.end_frame()
+
+    def run(self, frames: int = None):
+        """Run the updater routine. Can only be used once.
+        If frames is set, game closes after running that many of them.
+        """
         if not self.initialized:
             log.warning("Unable to run game - GameWindow is not initialized")
             return
 
         self.active = True
+        count = 0
         # while True:
         while self.active:
-            self.clock.tick(self.clock_speed)
-            # Keep in mind that this instance of task manager runs each frame.
-            # If there is custom pause implementation that require manager to be
-            # paused, its encouraged to create new one on local scene's level
-            self.task_mgr.update()
-            self.event_handler.update()
-            for event in self.event_handler.events:
-                if event.type == pgl.QUIT:
-                    self.active = False
-            self.tree.update()
-            # This will update whats visible on screen to player
-            self.window.flip()
+            # Profiler is checked once per frame, so it costs nothing if disabled
+            if self.profiler:
+                self._profiled_frame()
+            else:
+                self._frame()
+
+            count += 1
+            if frames is not None and count >= frames:
+                break
 
         self.exit()
@@ -0,0 +1,102 @@
+from pygame import image, Surface
+from hashlib import sha1
+from mmap import mmap, ACCESS_COPY
+from os import makedirs, replace, stat
+from os.path import abspath, join
+import struct
+import logging
+
+log = logging.getLogger(__name__)
+
+# On-disk storage of already decoded (and scaled) images. Each entry is a single
+# file, consisting of fixed-size header followed by raw pixels. Loading these
+# requires no decoding at all - just mapping file into memory
+
+# Magic, version, width, height, pixel format, source's mtime (ns) and size,
+# scale and colorkey (-1 if unset)
+HEADER = struct.Struct("<4sHII4sqqIi")
+MAGIC = b"WGFC"
+VERSION = 1
+
+
+def _pack_colorkey(colorkey) -> int:
+    if colorkey is None:
+        return -1
+    r, g, b = tuple(colorkey)[:3]
+    return (r << 16) | (g << 8) | b
+
+
+class ImageCache:
+    """Disk cache of decoded images"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, path) -> str:
+        # Entries are named after their source, thus outdated ones get overwritten
+        # instead of piling up
+        name = sha1(abspath(path).encode()).hexdigest()
+        return join(self.directory, f"{name}.wgfc")
+
+    def _expected(self, path, scale: int, colorkey) -> tuple:
+        st = stat(path)
+        return (st.st_mtime_ns, st.st_size, scale or 0, _pack_colorkey(colorkey))
+
+    def get(self, path, scale: int = None, colorkey=None) -> Surface:
+        """Get cached image of provided source, or None if its missing or stale.
+        Returned surface uses private memory-mapped copy of entry as its pixel
+        buffer, thus drawing on it never changes the entry.
+        """
+
+        try:
+            expected = self._expected(path, scale, colorkey)
+            with open(self._entry_path(path), "rb") as f:
+                # Private copy-on-write mapping, thus surface may be drawn on
+                # without touching the entry itself
+                mm = mmap(f.fileno(), 0, access=ACCESS_COPY)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, version, x, y, fmt, *info = HEADER.unpack_from(mm)
+        except struct.error:
+            return None
+
+        if magic != MAGIC or version != VERSION or tuple(info) != expected:
+            log.debug(f"Cached image of {path} is outdated")
+            return None
+
+        fmt = fmt.rstrip(b"\0").decode()
+        length = x * y * len(fmt)
+        if len(mm) < HEADER.size + length:
+            return None
+
+        # Surface keeps reference to the buffer, and thus to the mapping itself
+        view = memoryview(mm)[HEADER.size : HEADER.size + length]
+        return image.frombuffer(view, (x, y), fmt)
+
+    def set(self, path, img: Surface, scale: int = None, colorkey=None):
+        """Save decoded image of provided source into cache"""
+
+        fmt = "RGBA" if img.get_alpha() is not None else "RGB"
+        x, y = img.get_size()
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            x,
+            y,
+            fmt.encode(),
+            *self._expected(path, scale, colorkey),
+        )
+
+        entry = self._entry_path(path)
+        # Writing into temporary file first, to never leave half-written entries
+        tmp = f"{entry}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(header)
+                f.write(image.tostring(img, fmt))
+            replace(tmp, entry)
+        except OSError as e:
+            log.warning(f"Unable to cache {path}: {e}")
@@ -0,0 +1,314 @@
+from pygame import Rect
+from weakref import WeakKeyDictionary, ref
+from WGF.base import is_reachable
+from WGF.common import Counter
+from WGF.masks import mask_cache
+import WGF
+import logging
+
+log = logging.getLogger(__name__)
+
+# Collision detection between VisualNodes' rects. Bodies are kept in a uniform
+# grid, which is only updated for bodies that have moved since previous frame.
+# Thus each update only compares bodies that share at least one cell. Nodes are
+# referenced weakly, so bodies of dropped scenes go away together with them
+
+# Bodies collide if layer of each of them is included in mask of another
+ALL_LAYERS = -1
+
+
+class Body:
+    """Collision body of a node, registered in CollisionWorld"""
+
+    _entermethod: callable = None
+    _staymethod: callable = None
+    _exitmethod: callable = None
+
+    def __init__(
+        self,
+        node,
+        world,
+        id: int,
+        layer: int = 1,
+        mask: int = ALL_LAYERS,
+        pixel_perfect: bool = False,
+    ):
+        # Once node gets garbage collected, world drops its body on next update
+        self._node = ref(node, lambda _: world._dead.append(self))
+        self.world = world
+        self.id = id
+        self.layer = layer
+        self.mask = mask
+        # If set, overlapping rects only count as contact if opaque pixels of
+        # node's surface overlap too
+        self.pixel_perfect = pixel_perfect
+        # Range of occupied grid cells, as (x0, y0, x1, y1)
+        self.cells = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({self.node.name}, layer {self.layer})"
+
+    @property
+    def node(self):
+        return self._node()
+
+    # Each of these receives node of another body
+    def entermethod(self, func):
+        def inner():
+            self._entermethod = func
+
+        return inner()
+
+    def staymethod(self, func):
+        def inner():
+            self._staymethod = func
+
+        return inner()
+
+    def exitmethod(self, func):
+        def inner():
+            self._exitmethod = func
+
+        return inner()
+
+
+class CollisionWorld:
+    """Broadphase collision detection with enter/stay/exit callbacks.
+    Callbacks are fired from update(), once per frame. Only bodies of nodes that
+    are active and attached to scene tree via active ancestors collide.
+    """
+
+    def __init__(self, cell_size: int = 64):
+        self.cell_size = cell_size
+        # (x, y) -> bodies that overlap that cell
+        self._cells = {}
+        self._moved = set()
+        # Bodies of nodes that have been garbage collected
+        self._dead = []
+        self._counter = Counter()
+        # Node -> its body. Keys are weak, so world doesnt keep nodes alive
+        self.bodies = WeakKeyDictionary()
+        # Pairs of bodies (ordered by id) that have been touching on last update
+        self.contacts = set()
+        self._task = None
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}: ({len(self.bodies)} bodies, "
+            f"{len(self.contacts)} contacts)"
+        )
+
+    def add(
+        self,
+        node,
+        layer: int = 1,
+        mask: int = ALL_LAYERS,
+        pixel_perfect: bool = False,
+    ) -> Body:
+        """Make provided VisualNode collide with other bodies of this world"""
+
+        if node.body is not None:
+            node.body.world.remove(node)
+        body = Body(node, self, next(self._counter), layer, mask, pixel_perfect)
+        node.body = body
+        self.bodies[node] = body
+        self._place(body)
+        return body
+
+    def remove(self, node):
+        """Remove node's body. Exit callbacks of its current contacts are fired"""
+
+        body = self.bodies.pop(node)
+        node.body = None
+        self._moved.discard(body)
+        if body.cells is not None:
+            self._unplace(body)
+
+        for pair in sorted(self.contacts, key=self._pair_key):
+            if body in pair:
+                self.contacts.remove(pair)
+                self._notify(pair, "_exitmethod")
+
+    def mark_moved(self, body: Body):
+        """Schedule body's cells to be recalculated on next update"""
+        self._moved.add(body)
+
+    def _cell_range(self, rect: Rect) -> tuple:
+        size = self.cell_size
+        x, y, w, h = rect
+        # Empty rects still occupy the cell they are located in
+        return (
+            x // size,
+            y // size,
+            (x + w - 1 if w else x) // size,
+            (y + h - 1 if h else y) // size,
+        )
+
+    def _unplace(self, body: Body):
+        x0, y0, x1, y1 = body.cells
+        cells = self._cells
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                bodies = cells[x, y]
+                bodies.discard(body)
+                if not bodies:
+                    del cells[x, y]
+        body.cells = None
+
+    def _place(self, body: Body):
+        cells = self._cell_range(body.node.rect)
+        if cells == body.cells:
+            return
+        if body.cells is not None:
+            self._unplace(body)
+
+        x0, y0, x1, y1 = cells
+        storage = self._cells
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                bodies = storage.get((x, y))
+                if bodies is None:
+                    storage[x, y] = {body}
+                else:
+                    bodies.add(body)
+        body.cells = cells
+
+    def _flush(self):
+        if self._dead:
+            self._purge()
+        for body in self._moved:
+            self._place(body)
+        self._moved.clear()
+
+    def _purge(self):
+        # Contacts of dead bodies are dropped without exit callbacks, since there
+        # is no node to pass to these anymore
+        dead, self._dead = set(self._dead), []
+        for body in dead:
+            self._moved.discard(body)
+            if body.cells is not None:
+                self._unplace(body)
+        self.contacts = {
+            i for i in self.contacts if i[0] not in dead and i[1] not in dead
+        }
+
+    @staticmethod
+    def _is_active(body: Body, known: dict) -> bool:
+        node = body.node
+        return node is not None and node.active and is_reachable(node, known)
+
+    def find_contacts(self) -> set:
+        """Get pairs of bodies, which rects are currently overlapping"""
+
+        self._flush()
+        known = {}
+        active = {i for i in self.bodies.values() if self._is_active(i, known)}
+        contacts = set()
+        for (cx, cy), bodies in self._cells.items():
+            if len(bodies) < 2:
+                continue
+            items = [i for i in bodies if i in active]
+            rects = [i.node.rect for i in items]
+            for num, a in enumerate(items, start=1):
+                # Rects themselves are compared by pygame, which is much faster
+                # than doing it pair by pair
+                hits = rects[num - 1].collidelistall(rects[num:])
+                if not hits:
+                    continue
+                ax, ay = a.cells[0], a.cells[1]
+                for hit in hits:
+                    b = items[num + hit]
+                    # Pairs that share multiple cells are only reported by the
+                    # first (topleft) of them
+                    bx, by = b.cells[0], b.cells[1]
+                    if (ax if ax > bx else bx) != cx or (ay if ay > by else by) != cy:
+                        continue
+                    if not (a.layer & b.mask and b.layer & a.mask):
+                        continue
+                    pixel_perfect = a.pixel_perfect or b.pixel_perfect
+                    if pixel_perfect and not self._pixels_overlap(a, b):
+                        continue
+                    contacts.add((a, b) if a.id < b.id else (b, a))
+        return contacts
+
+    @staticmethod
+    def _body_mask(body: Body):
+        if body.pixel_perfect:
+            return mask_cache.get(body.node.surface)
+        return mask_cache.get_filled(body.node.rect.size)
+
+    def _pixels_overlap(self, a: Body, b: Body) -> bool:
+        # Narrowphase for pairs which rects are already known to collide
+        rect_a = a.node.rect
+        rect_b = b.node.rect
+        offset = (rect_b.x - rect_a.x, rect_b.y - rect_a.y)
+        return self._body_mask(a).overlap(self._body_mask(b), offset) is not None
+
+    @staticmethod
+    def _pair_key(pair: tuple) -> tuple:
+        return (pair[0].id, pair[1].id)
+
+    def _notify(self, pair: tuple, method: str):
+        a, b = pair
+        callback = getattr(a, method)
+        if callback:
+            callback(b.node)
+        callback = getattr(b, method)
+        if callback:
+            callback(a.node)
+
+    def update(self):
+        """Find current contacts and fire callbacks of their changes.
+        Pairs are processed in order of bodies' creation, to stay deterministic.
+        """
+
+        contacts = self.find_contacts()
+        previous = self.contacts
+        self.contacts = contacts
+
+        for pair in sorted(contacts - previous, key=self._pair_key):
+            self._notify(pair, "_entermethod")
+        for pair in sorted(contacts & previous, key=self._pair_key):
+            self._notify(pair, "_staymethod")
+        for pair in sorted(previous - contacts, key=self._pair_key):
+            self._notify(pair, "_exitmethod")
+
+    def query_rect(self, rect: Rect, mask: int = ALL_LAYERS) -> list:
+        """Get nodes of active bodies that overlap provided rect"""
+
+        self._flush()
+        x0, y0, x1, y1 = self._cell_range(Rect(rect))
+        found = set()
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                found.update(self._cells.get((x, y), ()))
+        known = {}
+        return [
+            i.node
+            for i in sorted(found, key=lambda i: i.id)
+            if i.layer & mask
+            and self._is_active(i, known)
+            and i.node.rect.colliderect(rect)
+        ]
+
+    def clear(self):
+        for node in list(self.bodies):
+            node.body = None
+        self.bodies.clear()
+        self._cells.clear()
+        self._moved.clear()
+        self._dead = []
+        self.contacts = set()
+
+    def start(self, task_mgr=None, name: str = "collision_world"):
+        """Make provided task manager (game's one by default) update world"""
+
+        from WGF.tasks import Task
+
+        task_mgr = task_mgr or WGF.task_mgr
+        self._task = Task(name=name, task_method=self.update)
+        task_mgr.tasks[name] = self._task
+
+    def stop(self):
+        if self._task:
+            self._task.stop()
@@ -1,4 +1,5 @@
-from dataclasses import dataclass, astuple, asdict
+from dataclasses import FrozenInstanceError
+from functools import lru_cache
 
 import logging
 
@@ -12,41 +13,77 @@ __all__ = [
     "Point",
 ]
 
-# This is a base for other dataclasses that need to have their internal conversion
+# This is a base for other types that need to have their internal conversion
 # methods and intended to be used where pygame expects tuple or list (for bettter
 # typehints, additional methods and other funny stuff).
-# Its kinda jank tho, due to how DC inheritance works
+# These are passed around in hot paths, thus they are slotted and implement what
+# dataclasses used to generate for them by hand. Each subclass should list its
+# fields in _fields, in the same order as its __init__ arguments
 class ConvertableType:
+    __slots__ = ()
+    _fields = ()
+
     # This will break default conversion to dict, but instead will represent type's
     # iteration in list/tuple-like way
     def __iter__(self):
-        for var in vars(self):
-            yield getattr(self, var)
+        return iter(self.to_tuple())
 
     # And this makes it possible to fetch values from type in both list-like and
-    # dict-like fashion, depending on type of key. This is kinda slow tho
+    # dict-like fashion, depending on type of key
     def __getitem__(self, key):
         if type(key) is int:
-            return astuple(self)[key]
+            return getattr(self, self._fields[key])
         elif type(key) is str:
-            return vars(self)[key]
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
         else:
             raise TypeError(f"key must be int or str, not {type(key).__name__}")
 
     # Support for len(cls). May be required in some places that expect tuple-like
     # or list-like behavior
     def __len__(self):
-        return len(vars(self))
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if other.__class__ is self.__class__:
+            return self.to_tuple() == other.to_tuple()
+        return NotImplemented
+
+    def __repr__(self):
+        values = ", ".join(f"{i}={getattr(self, i)!r}" for i in self._fields)
+        return f"{type(self).__name__}({values})"
 
-    # This is garbage, but I didnt find a better solution to dont require carrying
-    # this around and to keep ability to convert dataclass to dict.
+    # Without __dict__, default pickling would set fields one by one, which
+    # frozen types dont allow
+    def __reduce__(self):
+        return (type(self), self.to_tuple())
 
     # Names of converters are inspired by methods of Pandas Dataframes
     def to_tuple(self):
-        return astuple(self)
+        return tuple(getattr(self, i) for i in self._fields)
 
     def to_dict(self):
-        return asdict(self)
+        return {i: getattr(self, i) for i in self._fields}
+
+
+# Frozen types bypass their own __setattr__ with this during initialization
+_set = object.__setattr__
+
+
+class FrozenType(ConvertableType):
+    """Base of immutable (and thus hashable) convertable types"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def __hash__(self):
+        return hash(self.to_tuple())
 
 
 def clamp(val, minval, maxval):
@@ -55,33 +92,43 @@ def clamp(val, minval, maxval):
     return max(min(maxval, val), minval)
 
 
-@dataclass(frozen=True)
-class RGB(ConvertableType):
-    red: int = 0
-    green: int = 0
-    blue: int = 0
+# Colors are immutable, thus the same instance can be safely handed to everyone
+# who requests the same hex value
+@lru_cache(maxsize=1024)
+def _color_from_hex(cls, color: str):
+    if color.startswith("#"):
+        color = color[1:]
+
+    if len(color) != 6:
+        raise ValueError(color)
+
+    r = int(f"0x{color[0]}{color[1]}", 0)
+    g = int(f"0x{color[2]}{color[3]}", 0)
+    b = int(f"0x{color[4]}{color[5]}", 0)
+
+    return cls(r, g, b)
+
+
+class RGB(FrozenType):
+    __slots__ = ("red", "green", "blue")
+    _fields = __slots__
 
     # Ensuring our values will remain in valid RGB range
-    def __post_init__(self):
-        items = vars(self)
-        for i in items:
-            object.__setattr__(self, i, clamp(items[i], 0, 255))
+    def __init__(self, red: int = 0, green: int = 0, blue: int = 0):
+        _set(self, "red", red if 0 <= red <= 255 else clamp(red, 0, 255))
+        _set(self, "green", green if 0 <= green <= 255 else clamp(green, 0, 255))
+        _set(self, "blue", blue if 0 <= blue <= 255 else clamp(blue, 0, 255))
+
+    def __iter__(self):
+        return iter((self.red, self.green, self.blue))
+
+    def to_tuple(self):
+        return (self.red, self.green, self.blue)
 
     @classmethod
     def from_hex(cls, color: str):
         """Create RGB color from provided hex color"""
-        if color.startswith("#"):
-            color = color[1:]
-
-        # if len(color) < 6:
-        if len(color) != 6:
-            raise ValueError(color)
-
-        r = int(f"0x{color[0]}{color[1]}", 0)
-        g = int(f"0x{color[2]}{color[3]}", 0)
-        b = int(f"0x{color[4]}{color[5]}", 0)
-
-        return cls(r, g, b)
+        return _color_from_hex(cls, color)
 
     def to_hex(self) -> str:
         hx = "#"
@@ -90,24 +137,52 @@ class RGB(ConvertableType):
         return hx
 
 
-@dataclass(frozen=True)
 class RGBA(RGB):
-    alpha: int = 255
+    __slots__ = ("alpha",)
+    _fields = RGB._fields + __slots__
+
+    def __init__(self, red: int = 0, green: int = 0, blue: int = 0, alpha: int = 255):
+        super().__init__(red, green, blue)
+        _set(self, "alpha", alpha if 0 <= alpha <= 255 else clamp(alpha, 0, 255))
+
+    def __iter__(self):
+        return iter((self.red, self.green, self.blue, self.alpha))
+
+    def to_tuple(self):
+        return (self.red, self.green, self.blue, self.alpha)
 
 
 # Size is used for abstract height and width values
-@dataclass(frozen=True)
-class Size(ConvertableType):
-    width: int
-    height: int
+class Size(FrozenType):
+    __slots__ = ("width", "height")
+    _fields = __slots__
 
+    def __init__(self, width: int, height: int):
+        _set(self, "width", width)
+        _set(self, "height", height)
 
-# While point is used to reffer to some specific x, y location on screen
-# @dataclass(frozen=True)
-@dataclass
+    def __iter__(self):
+        return iter((self.width, self.height))
+
+    def to_tuple(self):
+        return (self.width, self.height)
+
+
+# While point is used to reffer to some specific x, y location on screen.
+# Unlike other types, its mutable - thus not hashable
 class Point(ConvertableType):
-    x: int
-    y: int
+    __slots__ = ("x", "y")
+    _fields = __slots__
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+    def __iter__(self):
+        return iter((self.x, self.y))
+
+    def to_tuple(self):
+        return (self.x, self.y)
 
 
 def Counter(start: int = 0):
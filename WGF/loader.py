@@ -1,14 +1,31 @@
-from pygame import image, mixer, transform, Surface, Rect, SRCALPHA
+from pygame import image, mixer, transform, Surface, Rect, SRCALPHA, RLEACCEL
 from pygame import font as pgfont
-from os import listdir
-from os.path import isfile, isdir, basename, join, splitext
+from collections import OrderedDict, namedtuple, deque
+from weakref import WeakValueDictionary
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+from os import scandir, stat
+from os.path import isfile, isdir, basename, dirname, join, splitext, getsize
 from WGF.common import RGB, Size
+from WGF.cache import ImageCache
+from WGF.pack import AssetPack, build_pack
+from WGF.audio import Music
+import json
 import logging
 
 log = logging.getLogger(__name__)
 
 
 # Various things to load media
+def _match_extensions(extensions: list, case_insensitive: bool) -> set:
+    if not extensions:
+        return None
+    if case_insensitive:
+        return {e.lower() for e in extensions}
+    return set(extensions)
+
+
 def get_files(
     path,
     include_subdirs: bool = False,
@@ -19,30 +36,24 @@ def get_files(
     files = []
 
     log.debug(f"Attempting to parse directory {path}")
-    directory_content = listdir(path)
-
-    if extensions and case_insensitive:
-        extensions = [f.lower() for f in extensions]
-
-    for item in directory_content:
-        log.debug(f"Processing {item}")
-        itempath = join(path, item)
-        if isdir(itempath):
-            if include_subdirs:
-                files += self.get_files(itempath, include_subdirs, extensions)
-            continue
-        # assuming that everything that isnt directory is file
-        if extensions:
-            for extension in extensions:
+    extensions = _match_extensions(extensions, case_insensitive)
+
+    with scandir(path) as directory_content:
+        for item in directory_content:
+            if item.is_dir():
+                if include_subdirs:
+                    files += get_files(
+                        item.path, include_subdirs, extensions, case_insensitive
+                    )
+                continue
+            # assuming that everything that isnt directory is file
+            if extensions:
+                file_ext = splitext(item.name)[-1]
                 if case_insensitive:
-                    file_ext = splitext(itempath)[-1].lower()
-                else:
-                    file_ext = splitext(itempath)[-1]
-
-                if file_ext == extension:
-                    files.append(itempath)
-        else:
-            files.append(itempath)
+                    file_ext = file_ext.lower()
+                if file_ext not in extensions:
+                    continue
+            files.append(item.path)
 
     log.debug(f"Fetched following files from {path}: {files}")
     return files
@@ -53,25 +64,177 @@ def _get_storage_name(filename: str) -> str:
     return splitext(basename(filename))[0]
 
 
+# Sizes and mtimes of files arent stored, since files can be edited in place
+# without touching their directory - thus these would go stale
+AssetEntry = namedtuple("AssetEntry", ["name", "path", "extension"])
+
+
+class AssetIndex:
+    """Index of files in assets directory.
+    Unlike get_files, rescans only re-read directories that have been changed.
+    """
+
+    def __init__(self, path, include_subdirs: bool = False):
+        self.path = path
+        self.include_subdirs = include_subdirs
+        # Directory -> (its mtime, files within, subdirectories within)
+        self._dirs = {}
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({self.path}, {len(self)} files)"
+
+    def __len__(self):
+        return sum(len(files) for _, files, _ in self._dirs.values())
+
+    def __iter__(self):
+        for _, files, _ in self._dirs.values():
+            yield from files
+
+    def _scan_directory(self, path) -> tuple:
+        files = []
+        subdirs = []
+        with scandir(path) as directory_content:
+            for item in directory_content:
+                if item.is_dir():
+                    subdirs.append(item.path)
+                    continue
+                files.append(
+                    AssetEntry(
+                        name=_get_storage_name(item.name),
+                        path=item.path,
+                        extension=splitext(item.name)[-1],
+                    )
+                )
+        return files, subdirs
+
+    def scan(self) -> list:
+        """Update index. Returns directories that had to be re-read"""
+
+        changed = []
+        known = self._dirs
+        self._dirs = {}
+        queue = [self.path]
+        while queue:
+            path = queue.pop()
+            try:
+                mtime = stat(path).st_mtime_ns
+            except OSError:
+                # Directory has been removed in between scans
+                continue
+            if path in known and known[path][0] == mtime:
+                _, files, subdirs = known[path]
+            else:
+                log.debug(f"Scanning directory {path}")
+                files, subdirs = self._scan_directory(path)
+                changed.append(path)
+            self._dirs[path] = (mtime, files, subdirs)
+            if self.include_subdirs:
+                queue += subdirs
+
+        return changed
+
+    def find(self, extensions: list = None, case_insensitive: bool = True) -> list:
+        """Get indexed files with provided extensions"""
+
+        extensions = _match_extensions(extensions, case_insensitive)
+        if not extensions:
+            return list(self)
+
+        if case_insensitive:
+            return [i for i in self if i.extension.lower() in extensions]
+        return [i for i in self if i.extension in extensions]
+
+    def collisions(
+        self,
+        extensions: list = None,
+        case_insensitive: bool = True,
+    ) -> dict:
+        """Get names shared by multiple files with provided extensions"""
+
+        names = {}
+        for i in self.find(extensions, case_insensitive):
+            names.setdefault(i.name, []).append(i.path)
+        return {name: sorted(paths) for name, paths in names.items() if len(paths) > 1}
+
+    def save(self, path):
+        """Dump index into provided json file"""
+
+        data = {
+            "path": self.path,
+            "include_subdirs": self.include_subdirs,
+            "dirs": {
+                d: [mtime, [list(f) for f in files], subdirs]
+                for d, (mtime, files, subdirs) in self._dirs.items()
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path):
+        """Load index from provided json file. It should be scanned afterwards"""
+
+        with open(path) as f:
+            data = json.load(f)
+
+        index = cls(data["path"], include_subdirs=data["include_subdirs"])
+        index._dirs = {
+            d: (mtime, [AssetEntry(*i) for i in files], subdirs)
+            for d, (mtime, files, subdirs) in data["dirs"].items()
+        }
+        return index
+
+
 # Idea is the same as in panda3d - we save files into storage under their
 # base name without extension
-def get_from_files(files: list, loader: callable, loader_kwargs: dict = {}) -> dict:
-    """Process provided files with provided loader"""
-    data = {}
-    for f in files:
-        filename = _get_storage_name(f)
+def get_from_files(
+    files: list,
+    loader: callable,
+    loader_kwargs: dict = {},
+    finalizer: callable = None,
+    workers: int = None,
+    errors: dict = None,
+) -> dict:
+    """Process provided files with provided loader.
+    If workers is set, loader runs on thread pool of that size, while finalizer
+    (if any) always gets applied to loader's results from the calling thread.
+    Failed files get reported (and saved into errors, if provided) in the order
+    of their paths, regardless of the order in which they've been processed.
+    """
+
+    # Sorting ensures same results (and same winner on name collisions) on any
+    # filesystem, independently of listdir's order
+    files = sorted(files)
+
+    def load(f):
         try:
-            item = loader(f, **loader_kwargs)
+            return loader(f, **loader_kwargs), None
         except Exception as e:
-            log.warning(f"Unable to load {item}: {e}")
-            continue
-        data[filename] = item
+            return None, e
 
-    return data
+    if workers and len(files) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() yields results in order of submitted files
+            results = list(executor.map(load, files))
+    else:
+        results = [load(f) for f in files]
 
+    data = {}
+    for f, (item, err) in zip(files, results):
+        if err is None and finalizer is not None:
+            try:
+                item = finalizer(item)
+            except Exception as e:
+                err = e
+
+        if err is not None:
+            log.warning(f"Unable to load {f}: {err}")
+            if errors is not None:
+                errors[f] = err
+            continue
+        data[_get_storage_name(f)] = item
 
-def _is_power_of_two(num) -> bool:
-    return num and not (num & (num - 1))
+    return data
 
 
 class InvalidSpriteSize(Exception):
@@ -82,11 +245,21 @@ class InvalidSpriteSize(Exception):
         super().__init__(message)
 
 
+def _to_rect(data) -> Rect:
+    if isinstance(data, dict):
+        return Rect(data["x"], data["y"], data["w"], data["h"])
+    return Rect(*data)
+
+
 class Spritesheet:
     """Spritesheet holder"""
 
     def __init__(self, image: Surface):
+        # (x, y, width, height, subsurface) -> sprite. Copies and subsurfaces of
+        # the same area are stored separately, since they behave differently
         self.sprites = {}
+        # Name -> sprite, for sheets sliced with atlas metadata
+        self.frames = {}
         self.image = image
 
     @classmethod
@@ -101,57 +274,522 @@ class Spritesheet:
             img = img.convert()
 
         if colorkey is not None:
-            img.set_colorkey(colorkey.astuple(), RLEACCEL)
+            img.set_colorkey(tuple(colorkey), RLEACCEL)
 
         return cls(img)
 
-    # #TODO: add args to skip some pixels on right/bottom of sheet
+    @classmethod
+    def from_atlas(
+        cls,
+        path,
+        colorkey: RGB = None,
+        has_alpha: bool = True,
+        subsurface: bool = True,
+    ):
+        """Get spritesheet sliced according to provided atlas metadata file.
+        Path to sheet's image is expected to be relative to metadata's path.
+        """
+
+        with open(path) as f:
+            metadata = json.load(f)
+
+        sheet = cls.from_file(
+            join(dirname(path), metadata["image"]),
+            colorkey=colorkey,
+            has_alpha=has_alpha,
+        )
+        sheet.load_atlas(metadata, subsurface=subsurface)
+        return sheet
+
+    def get_sprite(
+        self,
+        rect: Rect,
+        store: bool = True,
+        overwrite_known: bool = False,
+        subsurface: bool = False,
+    ) -> Surface:
+        """Get sprite from provided area of image.
+        Subsurfaces share pixels with the sheet, instead of being copies of them.
+        """
+
+        key = (rect.x, rect.y, rect.w, rect.h, subsurface)
+        if key in self.sprites and not overwrite_known:
+            return self.sprites[key]
+
+        if subsurface:
+            sprite = self.image.subsurface(rect)
+        else:
+            if self.image.get_alpha():
+                sprite = Surface(rect.size, SRCALPHA).convert_alpha()
+            else:
+                sprite = Surface(rect.size).convert()
+            sprite.blit(self.image, (0, 0), rect)
+
+        if store:
+            self.sprites[key] = sprite
+        return sprite
+
     # #TODO: maybe rename it to "to_sprites", since it turns whole img into these?
     def get_sprites(
-        self, size: Size, store: bool = True, overwrite_known: bool = False
+        self,
+        size: Size,
+        store: bool = True,
+        overwrite_known: bool = False,
+        subsurface: bool = False,
+        margin: int = 0,
+        spacing: int = 0,
     ) -> list:
-        """Get all sprites of provided size from image, if possible"""
+        """Get all sprites of provided size from image, if possible.
+        Margin is amount of pixels around the grid, spacing - between its cells.
+        """
 
         x, y = size
 
         img_x, img_y = self.image.get_size()
-        if img_x % x or img_y % y:
+        img_x -= margin * 2 - spacing
+        img_y -= margin * 2 - spacing
+        if img_x <= 0 or img_y <= 0 or img_x % (x + spacing) or img_y % (y + spacing):
             raise InvalidSpriteSize(size)
 
-        columns = int(img_x / x)
-        rows = int(img_y / y)
-
-        if not _is_power_of_two(columns) or not _is_power_of_two(rows):
-            raise InvalidSpriteSize(size)
+        columns = img_x // (x + spacing)
+        rows = img_y // (y + spacing)
 
         items = []
         for row in range(0, rows):
             log.debug(f"Processing row {row}")
             for column in range(0, columns):
-                log.debug(f"Processing column {column}")
-                sprite_x = column * x
-                sprite_y = row * y
-
-                rect = Rect(sprite_x, sprite_y, x, y)
-                # print(rect.size)
-                if (
-                    f"{sprite_x, sprite_y, x, y}" in self.sprites
-                    and not overwrite_known
-                ):
-                    sprite = self.sprites[f"{sprite_x, sprite_y, x, y}"]
-                else:
-                    if self.image.get_alpha():
-                        sprite = Surface(rect.size, SRCALPHA).convert_alpha()
-                    else:
-                        sprite = Surface(rect.size).convert()
-                    sprite.blit(self.image, (0, 0), rect)
-                    if store:
-                        self.sprites[f"{sprite_x, sprite_y, x, y}"] = sprite
-
-                items.append(sprite)
+                rect = Rect(
+                    margin + column * (x + spacing),
+                    margin + row * (y + spacing),
+                    x,
+                    y,
+                )
+                items.append(
+                    self.get_sprite(
+                        rect,
+                        store=store,
+                        overwrite_known=overwrite_known,
+                        subsurface=subsurface,
+                    )
+                )
 
         return items
 
+    def load_atlas(self, metadata: dict, subsurface: bool = True) -> dict:
+        """Slice sheet according to provided atlas metadata. It should look like:
+        {
+            "frames": {"name": [x, y, w, h] or {"x": x, "y": y, "w": w, "h": h}},
+            "grids": [{"prefix": "walk_", "size": [w, h], "margin": 0, "spacing": 0}]
+        }
+        Grid cells get named by prefix and their index. Returns name -> sprite.
+        """
+
+        frames = {}
+        for name, rect in metadata.get("frames", {}).items():
+            frames[name] = self.get_sprite(_to_rect(rect), subsurface=subsurface)
+
+        for grid in metadata.get("grids", []):
+            sprites = self.get_sprites(
+                Size(*grid["size"]),
+                subsurface=subsurface,
+                margin=grid.get("margin", 0),
+                spacing=grid.get("spacing", 0),
+            )
+            prefix = grid.get("prefix", "")
+            for num, sprite in enumerate(sprites):
+                frames[f"{prefix}{num}"] = sprite
+
+        self.frames.update(frames)
+        return frames
+
+
+def surface_size(surface: Surface) -> int:
+    """Estimate amount of bytes used by surface's pixels"""
+    x, y = surface.get_size()
+    return x * y * surface.get_bytesize()
+
+
+def sound_size(sound: mixer.Sound) -> int:
+    """Estimate amount of bytes used by decoded sound"""
+    # Streamed audio is never decoded as a whole
+    if isinstance(sound, Music):
+        return 0
+    # Sounds are stored in mixer's format, thus its used for estimation
+    init = mixer.get_init()
+    if not init:
+        return 0
+    frequency, fmt, channels = init
+    return int(sound.get_length() * frequency) * channels * (abs(fmt) // 8)
+
+
+class AssetStore:
+    """Dict-like storage of assets.
+
+    Assets can be either added manually or indexed - in which case they will only
+    be loaded on first access. If budget (in bytes) is set, least recently used
+    indexed assets get unloaded on overflow, unless they have been acquired by
+    their users. Manually added assets are never evicted, since they cant be
+    reloaded. Unloaded assets that are still in use elsewhere (say, surfaces of
+    nodes) are tracked weakly, and returned on next lookup instead of loading
+    their second copy.
+    """
+
+    def __init__(
+        self,
+        loader: callable = None,
+        budget: int = None,
+        sizeof: callable = None,
+    ):
+        self.loader = loader
+        self.budget = budget
+        self.sizeof = sizeof
+        # Loaded assets, ordered from least to most recently used
+        self._items = OrderedDict()
+        self._sizes = {}
+        # Name -> (path, loader, loader kwargs) of assets that can be loaded on
+        # demand. Loader is None for these that should use store's default one
+        self.index = {}
+        # Estimated amount of bytes used by loaded assets
+        self.used = 0
+        # Name -> amount of users that have acquired asset and not released it yet
+        self.refcounts = {}
+        # Name -> unloaded asset, for as long as something else keeps it alive
+        self._unloaded = WeakValueDictionary()
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}: ({len(self._items)} loaded, "
+            f"{len(self.index)} indexed, {self.used} bytes)"
+        )
+
+    def __getitem__(self, key: str):
+        if key in self._items:
+            self._items.move_to_end(key)
+            return self._items[key]
+
+        if key not in self.index:
+            raise KeyError(key)
+
+        item = self._unloaded.get(key)
+        if item is not None:
+            log.debug(f"Restoring {key}, which is still in use")
+            self._add(key, item)
+            self.evict()
+            return item
+
+        path, loader, kwargs = self.index[key]
+        log.debug(f"Lazily loading {key} from {path}")
+        item = (loader or self.loader)(path, **kwargs)
+        self._add(key, item)
+        self.evict()
+        return item
+
+    def __setitem__(self, key: str, value):
+        self._add(key, value)
+        self.evict()
+
+    def __delitem__(self, key: str):
+        known = False
+        if key in self._items:
+            self.unload(key)
+            known = True
+        if key in self.index:
+            del self.index[key]
+            known = True
+        self._unloaded.pop(key, None)
+        if not known:
+            raise KeyError(key)
+
+    def __contains__(self, key: str):
+        return key in self._items or key in self.index
+
+    def __iter__(self):
+        yield from self._items
+        for i in self.index:
+            if i not in self._items:
+                yield i
+
+    def __len__(self):
+        return len(self._items) + sum(1 for i in self.index if i not in self._items)
+
+    def _add(self, key: str, value):
+        self._unloaded.pop(key, None)
+        if key in self._items:
+            self.used -= self._sizes[key]
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if self.sizeof:
+            size = self.sizeof(value)
+        elif key in self.index and isfile(self.index[key][0]):
+            # Without better estimation, size of source file will have to do
+            size = getsize(self.index[key][0])
+        else:
+            size = 0
+        self._sizes[key] = size
+        self.used += size
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self)
+
+    # Accessing items reorders them, thus names have to be collected beforehand
+    def values(self):
+        return [self[i] for i in self.keys()]
+
+    def items(self):
+        return [(i, self[i]) for i in self.keys()]
+
+    def update(self, data: dict):
+        for key, value in data.items():
+            self._add(key, value)
+        self.evict()
+
+    @property
+    def loaded(self) -> tuple:
+        """Names of assets that are currently in memory"""
+        return tuple(self._items)
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._items
+
+    def add_to_index(self, key: str, path, loader: callable = None, **kwargs):
+        """Make asset available for loading on demand"""
+        self.index[key] = (path, loader, kwargs)
+        # Asset may have been unloaded from some other source
+        self._unloaded.pop(key, None)
+
+    def unload(self, key: str):
+        """Remove asset from memory. Indexed assets may be loaded again later"""
+        item = self._items.pop(key)
+        self.used -= self._sizes.pop(key)
+        try:
+            self._unloaded[key] = item
+        except TypeError:
+            # Some assets cant be referenced weakly, thus cant be tracked
+            pass
+
+    def acquire(self, key: str) -> int:
+        """Mark asset as used, which protects it from eviction until released.
+        Returns amount of its current users.
+        """
+        count = self.refcounts.get(key, 0) + 1
+        self.refcounts[key] = count
+        return count
+
+    def release(self, key: str) -> int:
+        """Mark asset as no longer used by one of its users.
+        Returns amount of remaining ones.
+        """
+        count = self.refcounts.get(key, 0) - 1
+        if count > 0:
+            self.refcounts[key] = count
+            return count
+        self.refcounts.pop(key, None)
+        return 0
+
+    def is_referenced(self, key: str) -> bool:
+        """Check if asset has been acquired and not released yet"""
+        return key in self.refcounts
+
+    def evict(self):
+        """Unload least recently used assets until store fits into its budget"""
+        if self.budget is None or self.used <= self.budget:
+            return
+
+        for key in list(self._items):
+            if self.used <= self.budget:
+                break
+            if key not in self.index or self.is_referenced(key):
+                continue
+            log.debug(f"Evicting {key} to fit into {self.budget} bytes")
+            self.unload(key)
+
+    def clear(self):
+        self._items.clear()
+        self._sizes.clear()
+        self.index.clear()
+        self.refcounts.clear()
+        self._unloaded.clear()
+        self.used = 0
+
+
+class IncrementalLoader:
+    """Loader of indexed assets, that spreads loading across multiple frames.
+    Each update it loads assets until its per-frame budget (in ms) runs out.
+    """
+
+    def __init__(self, budget_ms: float = 8, on_complete: callable = None):
+        self.budget_ms = budget_ms
+        self._on_complete = on_complete
+        # (store, name, size in bytes) of assets that are yet to be loaded
+        self.queue = deque()
+        self.items_done = 0
+        self.items_total = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.done = False
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}: ({self.items_done}/{self.items_total} items, "
+            f"{self.bytes_done}/{self.bytes_total} bytes)"
+        )
+
+    def add(self, store: AssetStore, name: str):
+        """Schedule loading of provided indexed asset"""
+
+        path = store.index[name][0]
+        size = getsize(path) if isfile(path) else 0
+        self.queue.append((store, name, size))
+        self.items_total += 1
+        self.bytes_total += size
+        self.done = False
+
+    def add_store(self, store: AssetStore):
+        """Schedule loading of all indexed assets of store, that arent loaded yet"""
+
+        for name in store.index:
+            if not store.is_loaded(name):
+                self.add(store, name)
+
+    @property
+    def progress(self) -> float:
+        """Share of loaded bytes (or items, if sizes are unknown), from 0 to 1"""
+
+        if self.bytes_total:
+            return self.bytes_done / self.bytes_total
+        if self.items_total:
+            return self.items_done / self.items_total
+        return 1.0
+
+    def update(self) -> bool:
+        """Load assets until frame's budget runs out. Returns True once done"""
+
+        if self.done:
+            return True
+
+        start = perf_counter()
+        # At least one asset is loaded each frame, even if it exceeds budget
+        while self.queue:
+            store, name, size = self.queue.popleft()
+            try:
+                store[name]
+            except Exception as e:
+                log.warning(f"Unable to load {name}: {e}")
+            self.items_done += 1
+            self.bytes_done += size
+            if (perf_counter() - start) * 1000 >= self.budget_ms:
+                break
+
+        if not self.queue:
+            self.done = True
+            if self._on_complete:
+                self._on_complete()
+        return self.done
+
+    def start(self, task_mgr=None, name: str = "incremental_loader"):
+        """Make provided task manager (game's one by default) run the loader"""
+
+        # Import is there, since tasks require game's clock to be initialized
+        import WGF
+        from WGF.tasks import Task
+
+        task_mgr = task_mgr or WGF.task_mgr
+        task_mgr.tasks[name] = Task(
+            name=name, task_method=self.update, stop_condition=True
+        )
+
+
+class Bundle:
+    """Named group of assets, that get loaded and unloaded together"""
+
+    def __init__(
+        self,
+        name: str,
+        images: list = None,
+        sounds: list = None,
+        fonts: list = None,
+    ):
+        self.name = name
+        self.images = list(images or [])
+        self.sounds = list(sounds or [])
+        self.fonts = list(fonts or [])
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}: ({self.name}, {len(self.images)} images, "
+            f"{len(self.sounds)} sounds, {len(self.fonts)} fonts)"
+        )
+
+
+class FontRegistry:
+    """Shared storage of fonts, keyed by their path, size and style.
+    Least recently used fonts get dropped once there are more than max_fonts.
+    """
+
+    def __init__(self, max_fonts: int = 32):
+        self.max_fonts = max_fonts
+        self._fonts = OrderedDict()
+        # Fonts may be requested from loader's worker threads
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({len(self)} fonts)"
+
+    def __len__(self):
+        return len(self._fonts)
+
+    def __contains__(self, key: tuple):
+        return key in self._fonts
+
+    def get(
+        self,
+        path,
+        size: int,
+        bold: bool = False,
+        italic: bool = False,
+        factory: callable = None,
+    ) -> pgfont.Font:
+        """Get font of provided size and style, creating it if necessary.
+        Path may be None, in which case pygame's default font is used. If factory
+        is set, its called with size to create font, and path is only its key.
+        """
+
+        key = (path, size, bold, italic)
+        with self._lock:
+            if key in self._fonts:
+                self._fonts.move_to_end(key)
+                return self._fonts[key]
+
+        # Parsing font file may take a while, so its done outside of lock
+        font = factory(size) if factory else pgfont.Font(path, size)
+        font.set_bold(bold)
+        font.set_italic(italic)
+
+        with self._lock:
+            font = self._fonts.setdefault(key, font)
+            self._fonts.move_to_end(key)
+            while len(self._fonts) > self.max_fonts:
+                dropped, _ = self._fonts.popitem(last=False)
+                log.debug(f"Dropping font {dropped} from registry")
+        return font
+
+    def forget(self, path):
+        """Drop all fonts made from provided path"""
+
+        with self._lock:
+            for key in [k for k in self._fonts if k[0] == path]:
+                del self._fonts[key]
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+
 
 # #TODO: rework loaders and storages into things attachable via decorators
 class AssetsLoader:
@@ -167,6 +805,14 @@ class AssetsLoader:
         sound_extensions: list = None,
         font_extensions: list = None,
         font_size: int = None,
+        max_fonts: int = 32,
+        workers: int = None,
+        lazy: bool = False,
+        image_budget: int = None,
+        sound_budget: int = None,
+        font_budget: int = None,
+        cache_directory: str = None,
+        stream_threshold: int = None,
     ):
         # Path to assets directory
         log.debug("Initializing assets loader")
@@ -183,13 +829,75 @@ class AssetsLoader:
 
         # Default font size. Ikr its not best to hardcode values, but whatever
         self.font_size = font_size or 10
+        # Fonts are shared between everything that requests them via loader
+        self.font_registry = FontRegistry(max_fonts=max_fonts)
+
+        # Default amount of threads used to decode files. None means loading
+        # everything one by one, from the main thread
+        self.workers = workers
+
+        # Path -> exception of files that failed to load
+        self.errors = {}
+
+        # (Directory, include_subdirs) -> its index. Used instead of walking
+        # the disk each time something needs to be loaded
+        self.indexes = {}
+
+        # If lazy, load_all only indexes files, which get loaded on first access
+        self.lazy = lazy
+        # Memory budgets of storages, in bytes. None means no limit
+        self.image_budget = image_budget
+        self.sound_budget = sound_budget
+        self.font_budget = font_budget
+
+        # If set, decoded images get cached on disk to skip decoding next time
+        self.cache = ImageCache(cache_directory) if cache_directory else None
+
+        # Sound files of this size (in bytes) or larger are treated as music,
+        # which is streamed from disk instead of being decoded into memory
+        self.stream_threshold = stream_threshold
+
+        # Name -> bundle. Amounts of bundles that use each asset are counted by
+        # storages themselves
+        self.bundles = {}
+
+        # Opened assets archives. These must remain open while their assets are
+        # in use, since fonts and lazy stores keep reading from them
+        self.packs = []
 
         self.clean_all()
 
+    def get_index(self, path, include_subdirs: bool = False) -> AssetIndex:
+        """Get up-to-date index of provided directory"""
+
+        key = (path, include_subdirs)
+        if key not in self.indexes:
+            self.indexes[key] = AssetIndex(path, include_subdirs=include_subdirs)
+        index = self.indexes[key]
+        index.scan()
+        return index
+
+    def find_files(
+        self,
+        path,
+        extensions: list = None,
+        include_subdirs: bool = False,
+        case_insensitive: bool = False,
+    ) -> list:
+        """Get paths of files with provided extensions from directory's index"""
+
+        index = self.get_index(path, include_subdirs)
+        for name, paths in index.collisions(extensions, case_insensitive).items():
+            log.warning(f"Multiple files share name {name}: {paths}")
+
+        return [i.path for i in index.find(extensions, case_insensitive)]
+
     # Single-item getters/loaders have no try/excepts. At least for now
     def get_sound(self, path) -> mixer.Sound:
-        """Get sound from provided path"""
+        """Get sound from provided path. Long files are returned as streamed Music"""
 
+        if self.stream_threshold is not None and getsize(path) >= self.stream_threshold:
+            return Music(path)
         return mixer.Sound(path)
 
     def load_sound(self, path) -> mixer.Sound:
@@ -197,7 +905,9 @@ class AssetsLoader:
 
         s = self.get_sound(path)
         filename = _get_storage_name(path)
-        # No protections/warnings from overwrites for now
+        # No protections/warnings from overwrites for now. Indexing source
+        # makes it possible to reload sound later
+        self.sounds.add_to_index(filename, path)
         self.sounds[filename] = s
 
         return s
@@ -208,13 +918,14 @@ class AssetsLoader:
         extensions: list = None,
         include_subdirs: bool = False,
         case_insensitive: bool = False,
+        workers: int = None,
     ) -> dict:
         """Get sounds from provided path"""
 
         path = path or self.sounds_directory
         extensions = extensions or self.sound_extensions
 
-        files = get_files(
+        files = self.find_files(
             path=path,
             extensions=extensions,
             include_subdirs=include_subdirs,
@@ -223,7 +934,12 @@ class AssetsLoader:
 
         # Idea is the same as in panda3d - we save files into storage under their
         # base name without extension
-        return get_from_files(files, self.get_sound)
+        return get_from_files(
+            files,
+            self.get_sound,
+            workers=workers or self.workers,
+            errors=self.errors,
+        )
 
     def load_sounds(
         self,
@@ -231,6 +947,7 @@ class AssetsLoader:
         extensions: list = None,
         include_subdirs: bool = False,
         case_insensitive: bool = False,
+        workers: int = None,
     ) -> dict:
         """Load sounds from provided path into self.sounds"""
 
@@ -239,21 +956,29 @@ class AssetsLoader:
             extensions=extensions,
             include_subdirs=include_subdirs,
             case_insensitive=case_insensitive,
+            workers=workers,
         )
 
-        # Python 3.5+ stuff
-        self.sounds = {**self.sounds, **s}
+        # Sources are indexed too, which makes it possible to reload these later
+        self.index_sounds(
+            path=path,
+            extensions=extensions,
+            include_subdirs=include_subdirs,
+            case_insensitive=case_insensitive,
+        )
+        self.sounds.update(s)
 
         return s
 
-    def get_image(
-        self,
-        path,
-        colorkey: RGB = None,
-        has_alpha: bool = True,
-        scale: int = None,
-    ) -> Surface:
-        """Get image from provided path"""
+    def decode_image(self, path, scale: int = None, colorkey: RGB = None) -> Surface:
+        """Read image from provided path, without converting it to display's
+        pixel format. Safe to use from non-main threads"""
+
+        # Colorkey isnt applied there, but cached entries still depend on it
+        if self.cache:
+            img = self.cache.get(path, scale=scale, colorkey=colorkey)
+            if img is not None:
+                return img
 
         # This will fail if path is invalid
         img = image.load(path)
@@ -264,6 +989,19 @@ class AssetsLoader:
             y = y * scale
             img = transform.scale(img, (x, y))
 
+        if self.cache:
+            self.cache.set(path, img, scale=scale, colorkey=colorkey)
+
+        return img
+
+    def convert_image(
+        self,
+        img: Surface,
+        colorkey: RGB = None,
+        has_alpha: bool = True,
+    ) -> Surface:
+        """Convert decoded image to display's pixel format"""
+
         if has_alpha and img.get_alpha():
             img = img.convert_alpha()
         else:
@@ -272,10 +1010,22 @@ class AssetsLoader:
         # This will set specific color to act as alpha channel
         # #TODO: idk if this will work with existing alpha tho
         if colorkey is not None:
-            img.set_colorkey(colorkey.astuple(), RLEACCEL)
+            img.set_colorkey(tuple(colorkey), RLEACCEL)
 
         return img
 
+    def get_image(
+        self,
+        path,
+        colorkey: RGB = None,
+        has_alpha: bool = True,
+        scale: int = None,
+    ) -> Surface:
+        """Get image from provided path"""
+
+        img = self.decode_image(path, scale=scale, colorkey=colorkey)
+        return self.convert_image(img, colorkey=colorkey, has_alpha=has_alpha)
+
     def load_image(
         self,
         path,
@@ -292,6 +1042,9 @@ class AssetsLoader:
             scale=scale,
         )
         filename = _get_storage_name(path)
+        self.images.add_to_index(
+            filename, path, colorkey=colorkey, has_alpha=has_alpha, scale=scale
+        )
         self.images[filename] = img
 
         return img
@@ -305,26 +1058,32 @@ class AssetsLoader:
         extensions: list = None,
         include_subdirs: bool = False,
         case_insensitive: bool = False,
+        workers: int = None,
     ) -> dict:
         """Get images from provided path"""
 
         path = path or self.images_directory
         extensions = extensions or self.image_extensions
 
-        files = get_files(
+        files = self.find_files(
             path=path,
             extensions=extensions,
             include_subdirs=include_subdirs,
             case_insensitive=case_insensitive,
         )
 
-        kwargs = {
-            "colorkey": colorkey,
-            "has_alpha": has_alpha,
-            "scale": scale,
-        }
-
-        return get_from_files(files, self.get_image, loader_kwargs=kwargs)
+        # Decoding may happen in parallel, but conversion to display format
+        # should always be done from the main thread
+        return get_from_files(
+            files,
+            self.decode_image,
+            loader_kwargs={"scale": scale, "colorkey": colorkey},
+            finalizer=lambda img: self.convert_image(
+                img, colorkey=colorkey, has_alpha=has_alpha
+            ),
+            workers=workers or self.workers,
+            errors=self.errors,
+        )
 
     def load_images(
         self,
@@ -335,6 +1094,7 @@ class AssetsLoader:
         extensions: list = None,
         include_subdirs: bool = False,
         case_insensitive: bool = False,
+        workers: int = None,
     ) -> dict:
         """Load images from provided path into self.images"""
 
@@ -346,9 +1106,19 @@ class AssetsLoader:
             extensions=extensions,
             include_subdirs=include_subdirs,
             case_insensitive=case_insensitive,
+            workers=workers,
         )
 
-        self.images = {**self.images, **i}
+        self.index_images(
+            path=path,
+            colorkey=colorkey,
+            has_alpha=has_alpha,
+            scale=scale,
+            extensions=extensions,
+            include_subdirs=include_subdirs,
+            case_insensitive=case_insensitive,
+        )
+        self.images.update(i)
 
         return i
 
@@ -357,11 +1127,42 @@ class AssetsLoader:
         path,
         size: int = None,
     ) -> pgfont.Font:
-        """Get font from provided path"""
+        """Get font from provided path. Fonts are shared via font_registry"""
 
         # Not best to hardcode it, ikr
         size = size or self.font_size
-        return pgfont.Font(path, size)
+        return self.font_registry.get(path, size)
+
+    def font(
+        self,
+        name: str = None,
+        size: int = None,
+        bold: bool = False,
+        italic: bool = False,
+    ) -> pgfont.Font:
+        """Get font of provided size and style by its storage name or path.
+        If name is None, pygame's default font is used.
+        """
+
+        size = size or self.font_size
+        if name not in self.fonts.index:
+            return self.font_registry.get(name, size, bold, italic)
+
+        path, loader, kwargs = self.fonts.index[name]
+        if loader is None:
+            return self.font_registry.get(path, size, bold, italic)
+
+        # Paths of custom loaders (say, names inside of packs) arent files, thus
+        # these have to create fonts. Their arguments tell such fonts apart
+        kwargs = {k: v for k, v in kwargs.items() if k != "size"}
+        key = (path, loader, tuple(kwargs.items()))
+        return self.font_registry.get(
+            key,
+            size,
+            bold,
+            italic,
+            factory=lambda size: loader(path, size=size, **kwargs),
+        )
 
     def load_font(
         self,
@@ -372,6 +1173,7 @@ class AssetsLoader:
 
         f = self.get_font(path, size)
         filename = _get_storage_name(path)
+        self.fonts.add_to_index(filename, path, size=size)
         self.fonts[filename] = f
 
         return f
@@ -383,20 +1185,27 @@ class AssetsLoader:
         extensions: list = None,
         include_subdirs: bool = False,
         case_insensitive: bool = False,
+        workers: int = None,
     ) -> dict:
         """Get fonts from provided path"""
 
         path = path or self.fonts_directory
         extensions = extensions or self.font_extensions
 
-        files = get_files(
+        files = self.find_files(
             path=path,
             extensions=extensions,
             include_subdirs=include_subdirs,
             case_insensitive=case_insensitive,
         )
 
-        return get_from_files(files, self.get_font)
+        return get_from_files(
+            files,
+            self.get_font,
+            loader_kwargs={"size": size},
+            workers=workers or self.workers,
+            errors=self.errors,
+        )
 
     def load_fonts(
         self,
@@ -405,6 +1214,7 @@ class AssetsLoader:
         extensions: list = None,
         include_subdirs: bool = False,
         case_insensitive: bool = False,
+        workers: int = None,
     ) -> dict:
         """Load fonts from provided path into self.fonts"""
 
@@ -414,22 +1224,283 @@ class AssetsLoader:
             extensions=extensions,
             include_subdirs=include_subdirs,
             case_insensitive=case_insensitive,
+            workers=workers,
         )
 
-        self.fonts = {**self.fonts, **f}
+        self.index_fonts(
+            path=path,
+            size=size,
+            extensions=extensions,
+            include_subdirs=include_subdirs,
+            case_insensitive=case_insensitive,
+        )
+        self.fonts.update(f)
 
         return f
 
-    def load_all(self):
-        """Load all valid media from provided paths into relevant storages"""
+    def _index(
+        self,
+        store: AssetStore,
+        path,
+        extensions: list,
+        include_subdirs: bool,
+        case_insensitive: bool,
+        **loader_kwargs,
+    ) -> list:
+        files = self.find_files(
+            path=path,
+            extensions=extensions,
+            include_subdirs=include_subdirs,
+            case_insensitive=case_insensitive,
+        )
+        names = []
+        for f in sorted(files):
+            name = _get_storage_name(f)
+            store.add_to_index(name, f, **loader_kwargs)
+            names.append(name)
+        return names
+
+    def index_images(
+        self,
+        path=None,
+        colorkey: RGB = None,
+        has_alpha: bool = True,
+        scale: int = None,
+        extensions: list = None,
+        include_subdirs: bool = False,
+        case_insensitive: bool = False,
+    ) -> list:
+        """Add images from provided path to self.images, without loading them"""
 
-        self.load_images()
-        self.load_sounds()
-        self.load_fonts()
+        return self._index(
+            self.images,
+            path=path or self.images_directory,
+            extensions=extensions or self.image_extensions,
+            include_subdirs=include_subdirs,
+            case_insensitive=case_insensitive,
+            colorkey=colorkey,
+            has_alpha=has_alpha,
+            scale=scale,
+        )
+
+    def index_sounds(
+        self,
+        path=None,
+        extensions: list = None,
+        include_subdirs: bool = False,
+        case_insensitive: bool = False,
+    ) -> list:
+        """Add sounds from provided path to self.sounds, without loading them"""
+
+        return self._index(
+            self.sounds,
+            path=path or self.sounds_directory,
+            extensions=extensions or self.sound_extensions,
+            include_subdirs=include_subdirs,
+            case_insensitive=case_insensitive,
+        )
+
+    def index_fonts(
+        self,
+        path=None,
+        size: int = None,
+        extensions: list = None,
+        include_subdirs: bool = False,
+        case_insensitive: bool = False,
+    ) -> list:
+        """Add fonts from provided path to self.fonts, without loading them"""
+
+        return self._index(
+            self.fonts,
+            path=path or self.fonts_directory,
+            extensions=extensions or self.font_extensions,
+            include_subdirs=include_subdirs,
+            case_insensitive=case_insensitive,
+            size=size,
+        )
+
+    def index_all(self):
+        """Index all valid media from provided paths into relevant storages"""
+
+        self.index_images()
+        self.index_sounds()
+        self.index_fonts()
+
+    def load_all(self, workers: int = None):
+        """Load all valid media from provided paths into relevant storages.
+        If workers is set, files get decoded on thread pool of that size.
+        In lazy mode, files only get indexed, to be loaded on first access.
+        """
+
+        if self.lazy:
+            self.index_all()
+            return
+
+        self.load_images(workers=workers)
+        self.load_sounds(workers=workers)
+        self.load_fonts(workers=workers)
+
+    def load_incrementally(
+        self,
+        budget_ms: float = 8,
+        on_complete: callable = None,
+        task_mgr=None,
+    ) -> IncrementalLoader:
+        """Load all valid media from provided paths across multiple frames,
+        spending up to budget_ms on each. Loading is driven by task manager.
+        """
+
+        self.index_all()
+        loader = IncrementalLoader(budget_ms=budget_ms, on_complete=on_complete)
+        for store in (self.images, self.sounds, self.fonts):
+            loader.add_store(store)
+        loader.start(task_mgr)
+        return loader
+
+    def add_bundle(self, bundle: Bundle) -> Bundle:
+        """Register provided bundle"""
+
+        self.bundles[bundle.name] = bundle
+        return bundle
+
+    def _bundle_assets(self, name: str) -> list:
+        bundle = self.bundles[name]
+        return (
+            [("images", self.images, i) for i in bundle.images]
+            + [("sounds", self.sounds, i) for i in bundle.sounds]
+            + [("fonts", self.fonts, i) for i in bundle.fonts]
+        )
+
+    def acquire(self, name: str, load: bool = True) -> list:
+        """Mark assets of provided bundle as used and load them, unless told
+        otherwise. Returns (kind, store, name) of assets that arent loaded yet.
+        """
+
+        missing = []
+        for kind, store, asset in self._bundle_assets(name):
+            store.acquire(asset)
+            if store.is_loaded(asset):
+                continue
+            if not load:
+                missing.append((kind, store, asset))
+                continue
+            # Accessing indexed asset loads it, if it wasnt loaded already
+            try:
+                store[asset]
+            except Exception as e:
+                log.warning(f"Unable to load {asset} of bundle {name}: {e}")
+        return missing
+
+    def release(self, name: str) -> list:
+        """Mark assets of provided bundle as no longer used by it. Assets that
+        arent used by any bundle anymore get unloaded. Returns their names.
+        """
+
+        unloaded = []
+        for kind, store, asset in self._bundle_assets(name):
+            if store.release(asset):
+                continue
+            # Assets without known source cant be loaded back, thus are kept
+            if store.is_loaded(asset) and asset in store.index:
+                store.unload(asset)
+                unloaded.append(asset)
+
+        log.debug(f"Released bundle {name}, unloaded {unloaded}")
+        return unloaded
+
+    def memory_usage(self) -> dict:
+        """Get estimated amount of bytes used by each storage"""
+
+        return {
+            "images": self.images.used,
+            "sounds": self.sounds.used,
+            "fonts": self.fonts.used,
+        }
+
+    def build_pack(self, output, include_subdirs: bool = False) -> dict:
+        """Pack all valid media from provided paths into single archive"""
+
+        entries = []
+        for kind, path, extensions in (
+            ("image", self.images_directory, self.image_extensions),
+            ("sound", self.sounds_directory, self.sound_extensions),
+            ("font", self.fonts_directory, self.font_extensions),
+        ):
+            files = self.find_files(
+                path=path,
+                extensions=extensions,
+                include_subdirs=include_subdirs,
+                case_insensitive=True,
+            )
+            entries += [(kind, _get_storage_name(f), f) for f in files]
+
+        return build_pack(output, entries)
+
+    def _get_packed_image(
+        self,
+        name: str,
+        pack: AssetPack,
+        colorkey: RGB = None,
+        has_alpha: bool = True,
+        scale: int = None,
+    ) -> Surface:
+        img = pack.get_image(name)
+        if scale:
+            x, y = img.get_size()
+            img = transform.scale(img, (x * scale, y * scale))
+        return self.convert_image(img, colorkey=colorkey, has_alpha=has_alpha)
+
+    def _get_packed_font(self, name: str, pack: AssetPack, size: int = None):
+        return pack.get_font(name, size or self.font_size)
+
+    def load_pack(
+        self,
+        path,
+        colorkey: RGB = None,
+        has_alpha: bool = True,
+        scale: int = None,
+        font_size: int = None,
+    ) -> AssetPack:
+        """Load all media from provided assets archive into relevant storages.
+        In lazy mode, these only get indexed, to be loaded on first access.
+        """
+
+        pack = AssetPack(path)
+        self.packs.append(pack)
+
+        stores = (
+            (
+                self.images,
+                pack.images,
+                self._get_packed_image,
+                {"colorkey": colorkey, "has_alpha": has_alpha, "scale": scale},
+            ),
+            (self.sounds, pack.sounds, lambda name, pack: pack.get_sound(name), {}),
+            (self.fonts, pack.fonts, self._get_packed_font, {"size": font_size}),
+        )
+
+        for store, names, loader, kwargs in stores:
+            for name in names:
+                # Same as with files, loaded assets remain indexed - so these can
+                # be looked up (say, fonts of other sizes) or reloaded later
+                store.add_to_index(name, name, loader=loader, pack=pack, **kwargs)
+                if self.lazy:
+                    continue
+                try:
+                    store[name] = loader(name, pack=pack, **kwargs)
+                except Exception as e:
+                    log.warning(f"Unable to load {name} from {path}: {e}")
+                    self.errors[f"{path}:{name}"] = e
+
+        return pack
 
     def clean_all(self):
         """Clean all local storages"""
 
-        self.images = {}
-        self.sounds = {}
-        self.fonts = {}
+        self.images = AssetStore(
+            self.get_image, budget=self.image_budget, sizeof=surface_size
+        )
+        self.sounds = AssetStore(
+            self.get_sound, budget=self.sound_budget, sizeof=sound_size
+        )
+        self.fonts = AssetStore(self.get_font, budget=self.font_budget)
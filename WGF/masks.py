@@ -0,0 +1,109 @@
+from pygame import Surface, mask
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+import logging
+
+log = logging.getLogger(__name__)
+
+# Pixel-perfect collision masks, cached per surface. Animations get their frames
+# from shared frame cache, thus nodes playing the same animation share masks too
+
+
+def mask_size(item: mask.Mask) -> int:
+    """Estimate amount of bytes used by mask's bits"""
+    # Pygame stores each row of bits in machine words
+    w, h = item.get_size()
+    return (w + 63) // 64 * 8 * h
+
+
+class MaskCache:
+    """Process-wide storage of surfaces' collision masks"""
+
+    def __init__(self, threshold: int = 127, max_filled: int = 256):
+        # Pixels with alpha above threshold are considered solid
+        self.threshold = threshold
+        # Weak keys ensure masks die together with their surfaces
+        self._storage = WeakKeyDictionary()
+        # Size -> fully solid mask, for bodies that arent pixel-perfect. Ordered
+        # from least to most recently used, since sizes of rects may keep changing
+        self._filled = OrderedDict()
+        self.max_filled = max_filled
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}: ({len(self._storage)} masks, "
+            f"{self.memory_usage()} bytes)"
+        )
+
+    def __len__(self):
+        return len(self._storage)
+
+    def get(self, surface: Surface) -> mask.Mask:
+        """Get mask of provided surface, making it if necessary"""
+
+        item = self._storage.get(surface)
+        if item is not None:
+            self.hits += 1
+            return item
+
+        self.misses += 1
+        item = mask.from_surface(surface, self.threshold)
+        self._storage[surface] = item
+        return item
+
+    def get_filled(self, size: tuple) -> mask.Mask:
+        """Get fully solid mask of provided size"""
+
+        size = tuple(size)
+        item = self._filled.get(size)
+        if item is not None:
+            self._filled.move_to_end(size)
+            return item
+
+        item = mask.Mask(size, fill=True)
+        self._filled[size] = item
+        if len(self._filled) > self.max_filled:
+            self._filled.popitem(last=False)
+        return item
+
+    def forget(self, surface: Surface):
+        """Drop mask of provided surface. Should be called once its pixels change"""
+        self._storage.pop(surface, None)
+
+    def precompute(self, surfaces: list):
+        """Make masks of provided surfaces ahead of time"""
+        for surface in surfaces:
+            self.get(surface)
+
+    def precompute_animation(self, animation):
+        """Make masks of animation's current (transformed) frames"""
+        self.precompute(animation.sprites)
+
+    def overlap(self, a, b) -> bool:
+        """Check if opaque pixels of two VisualNodes overlap.
+        Nodes which rects dont collide are rejected without touching masks.
+        """
+
+        rect_a = a.rect
+        rect_b = b.rect
+        if not rect_a.colliderect(rect_b):
+            return False
+        offset = (rect_b.x - rect_a.x, rect_b.y - rect_a.y)
+        return self.get(a.surface).overlap(self.get(b.surface), offset) is not None
+
+    def memory_usage(self) -> int:
+        """Get estimated amount of bytes used by cached masks"""
+        return sum(mask_size(i) for i in self._storage.values()) + sum(
+            mask_size(i) for i in self._filled.values()
+        )
+
+    def clear(self):
+        self._storage.clear()
+        self._filled.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+mask_cache = MaskCache()
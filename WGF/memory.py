@@ -0,0 +1,243 @@
+from pygame import Surface, image
+from collections import namedtuple
+from hashlib import blake2b
+import gc
+import WGF
+import logging
+
+log = logging.getLogger(__name__)
+
+# Accounting of memory used by surfaces' pixels. Subsurfaces dont own pixels, so
+# they are counted as 0 bytes, while their topmost parent gets attributed to the
+# same owners instead. Surface referenced from multiple places is only counted
+# once in total, but appears in totals of each of its sources/scenes/node types
+
+SurfaceRecord = namedtuple(
+    "SurfaceRecord", ["surface", "size", "bytes", "parent", "owners"]
+)
+
+
+def surface_bytes(surface: Surface) -> int:
+    """Get amount of bytes owned by surface's pixels. Subsurfaces own none"""
+    if surface.get_parent() is not None:
+        return 0
+    x, y = surface.get_size()
+    return x * y * surface.get_bytesize()
+
+
+class MemoryReport:
+    """Collection of surfaces, attributed to places that reference them"""
+
+    def __init__(self):
+        # id(surface) -> SurfaceRecord. Records keep surfaces alive, so ids
+        # cant be reused by other objects during collection
+        self.records = {}
+        # Category -> name -> ids of surfaces attributed to it
+        self.groups = {"source": {}, "scene": {}, "node_type": {}}
+        # Name -> bytes used by related caches, that dont consist of surfaces
+        self.extra = {}
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}: ({len(self.records)} surfaces, "
+            f"{self.total} bytes)"
+        )
+
+    def add(
+        self,
+        surface: Surface,
+        owner: str,
+        source: str = None,
+        scene: str = None,
+        node_type: str = None,
+    ):
+        """Attribute surface (and its parent, if its a subsurface) to owner"""
+
+        if not isinstance(surface, Surface):
+            return
+
+        record = self.records.get(id(surface))
+        if record is None:
+            parent = surface.get_abs_parent()
+            if parent is surface:
+                parent = None
+            record = SurfaceRecord(
+                surface, surface.get_size(), surface_bytes(surface), parent, []
+            )
+            self.records[id(surface)] = record
+        record.owners.append(owner)
+
+        for category, name in (
+            ("source", source),
+            ("scene", scene),
+            ("node_type", node_type),
+        ):
+            if name is not None:
+                self.groups[category].setdefault(name, set()).add(id(surface))
+
+        if record.parent is not None:
+            self.add(record.parent, f"{owner} (parent)", source, scene, node_type)
+
+    def add_assets(self, assets):
+        """Add loaded images of provided AssetsLoader"""
+
+        for name in assets.images.loaded:
+            # Accessing store would reorder its LRU queue
+            self.add(assets.images._items[name], f"images/{name}", source="images")
+
+    def add_spritesheet(self, sheet, name: str = None):
+        name = name or f"spritesheet_{id(sheet):x}"
+        self.add(sheet.image, f"{name}/image", source="spritesheets")
+        for rect, sprite in sheet.sprites.items():
+            self.add(sprite, f"{name}/{rect}", source="spritesheets")
+        for frame, sprite in sheet.frames.items():
+            self.add(sprite, f"{name}/{frame}", source="spritesheets")
+
+    def add_animation(
+        self,
+        animation,
+        name: str = None,
+        scene: str = None,
+        node_type: str = None,
+    ):
+        name = name or f"animation_{id(animation):x}"
+        for num, sprite in enumerate(animation.source):
+            self.add(sprite, f"{name}/source/{num}", "animations", scene, node_type)
+        for num, sprite in enumerate(animation.sprites):
+            self.add(sprite, f"{name}/frame/{num}", "animations", scene, node_type)
+
+    def add_frame_cache(self, cache):
+        for source, variants in list(cache._storage.items()):
+            for key, sprite in variants.items():
+                self.add(sprite, f"frame_cache/{id(source):x}/{key}", "frame_cache")
+
+    def add_node(self, node, scene: str = None, path: str = None):
+        """Add surfaces of provided node and all of its children"""
+
+        path = f"{path}/{node.name}" if path else node.name
+        node_type = type(node).__name__
+        for attr in ("surface", "background"):
+            surface = getattr(node, attr, None)
+            if isinstance(surface, Surface):
+                self.add(surface, f"{path}.{attr}", "nodes", scene, node_type)
+
+        animation = getattr(node, "animation", None)
+        if animation is not None:
+            self.add_animation(animation, f"{path}.animation", scene, node_type)
+
+        atlas = getattr(node, "atlas", None)
+        if atlas is not None:
+            for num, page in enumerate(atlas.pages):
+                self.add(page, f"{path}.atlas/{num}", "glyph_atlases", scene, node_type)
+
+        for child in node._children.values():
+            self.add_node(child, scene, path)
+
+    def add_tree(self, tree):
+        """Add surfaces of all nodes of provided scene tree, grouped by scene"""
+
+        for name, scene in tree._children.items():
+            self.add_node(scene, scene=name)
+
+    @property
+    def total(self) -> int:
+        return sum(i.bytes for i in self.records.values())
+
+    def totals(self, category: str) -> dict:
+        """Get amount of bytes attributed to each name of provided category"""
+
+        records = self.records
+        return {
+            name: sum(records[i].bytes for i in ids)
+            for name, ids in self.groups[category].items()
+        }
+
+    def largest(self, count: int = 10) -> list:
+        """Get records of surfaces that own the most memory"""
+
+        return sorted(self.records.values(), key=lambda i: i.bytes, reverse=True)[
+            :count
+        ]
+
+    def duplicates(self) -> list:
+        """Get groups of different surfaces with identical pixels.
+        This copies pixels of each surface, thus may be slow.
+        """
+
+        found = {}
+        for record in self.records.values():
+            if not record.bytes:
+                continue
+            surface = record.surface
+            digest = blake2b(image.tostring(surface, "RGBA")).digest()
+            found.setdefault((record.size, digest), []).append(record)
+        return [i for i in found.values() if len(i) > 1]
+
+    def report(self, top: int = 10) -> dict:
+        return {
+            "total": self.total,
+            "surfaces": len(self.records),
+            "by_source": self.totals("source"),
+            "by_scene": self.totals("scene"),
+            "by_node_type": self.totals("node_type"),
+            "extra": dict(self.extra),
+            "largest": [
+                {"size": tuple(i.size), "bytes": i.bytes, "owners": i.owners}
+                for i in self.largest(top)
+            ],
+        }
+
+    def summary(self, top: int = 10) -> list:
+        """Get human-readable lines with collected totals"""
+
+        lines = [f"total: {self.total} bytes in {len(self.records)} surfaces"]
+        for category in self.groups:
+            for name, used in sorted(
+                self.totals(category).items(), key=lambda i: i[1], reverse=True
+            ):
+                lines.append(f"{category} {name}: {used} bytes")
+        for name, used in self.extra.items():
+            lines.append(f"extra {name}: {used} bytes")
+        for record in self.largest(top):
+            x, y = record.size
+            owners = ", ".join(record.owners[:3])
+            if len(record.owners) > 3:
+                owners += f" (+{len(record.owners) - 3})"
+            lines.append(f"{x}x{y}: {record.bytes} bytes - {owners}")
+        return lines
+
+
+def surface_report(
+    game=None,
+    spritesheets: list = None,
+    animations: list = None,
+) -> MemoryReport:
+    """Collect surfaces of game's assets, frame cache and nodes.
+    Unless provided, spritesheets and animations are found via garbage collector.
+    """
+
+    from WGF.loader import Spritesheet
+    from WGF.tasks import Animation, frame_cache
+    from WGF.masks import mask_cache
+
+    game = game or WGF.game
+    if spritesheets is None or animations is None:
+        found = gc.get_objects()
+        if spritesheets is None:
+            spritesheets = [i for i in found if isinstance(i, Spritesheet)]
+        if animations is None:
+            animations = [i for i in found if isinstance(i, Animation)]
+        del found
+
+    report = MemoryReport()
+    report.add_assets(game.assets)
+    for sheet in spritesheets:
+        report.add_spritesheet(sheet)
+    for animation in animations:
+        report.add_animation(animation)
+    report.add_frame_cache(frame_cache)
+    report.add_tree(game.tree)
+    report.extra["collision_masks"] = mask_cache.memory_usage()
+
+    log.debug(f"Collected {len(report.records)} surfaces ({report.total} bytes)")
+    return report
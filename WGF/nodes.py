@@ -1,9 +1,15 @@
-from WGF import camera, Point, RGB, game, tree
+from WGF import camera, Point, RGB, game, tree, anim_mgr
+import WGF
 from WGF.base import NodeBase
 from WGF.tasks import Animation
 from WGF.common import Counter
+from WGF.text import GlyphText, glyph_atlases
 from pygame import Surface, font, mouse
+from concurrent.futures import ThreadPoolExecutor
+from types import GeneratorType
+from time import perf_counter
 from enum import Enum
+import weakref
 import logging
 
 log = logging.getLogger(__name__)
@@ -22,8 +28,6 @@ class Align(Enum):
 class Node(NodeBase):
     """Base node, from which others should inherit"""
 
-    _parent = None
-
     _initmethod: callable = None
     _updatemethod: callable = None
     _pausemethod: callable = None
@@ -76,7 +80,12 @@ class Node(NodeBase):
             return
 
         if self._initmethod:
-            self._initmethod()
+            result = self._initmethod()
+            # Initmethods that yield can be time-sliced by ScenePreloader. But
+            # if they are run directly, there is no reason to wait
+            if isinstance(result, GeneratorType):
+                for _ in result:
+                    pass
         self.initialized = True
 
     def update(self) -> bool:
@@ -140,6 +149,9 @@ class Node(NodeBase):
 
 
 class VisualNode(Node):
+    # Collision body, if node has been added to CollisionWorld
+    body = None
+
     def __init__(
         self,
         name: str,
@@ -195,6 +207,9 @@ class VisualNode(Node):
             self.rect.centerx = int(camera.pos.x * self.distance + self.pos.x)
             self.rect.centery = int(camera.pos.y * self.distance + self.pos.y)
 
+        if self.body is not None:
+            self.body.world.mark_moved(self.body)
+
     @property
     def realpos(self):
         return self.rect.get_pos()
@@ -215,7 +230,14 @@ class TextNode(VisualNode):
         frame: Surface = None,
         distance: float = 0.0,
         align: Align = Align.center,
+        font_size: int = None,
+        bold: bool = False,
+        italic: bool = False,
     ):
+        # Font may also be storage name or path, in which case its fetched from
+        # game's font registry and shared with other nodes that use it
+        if font is None or isinstance(font, str):
+            font = game.assets.font(font, size=font_size, bold=bold, italic=italic)
         self.font = font
         self.antialiasing = antialiasing
         self.color = color
@@ -248,27 +270,117 @@ class TextNode(VisualNode):
         super().draw()
 
 
+class GlyphTextNode(VisualNode):
+    """Text node, composed from glyphs of shared glyph atlas.
+    Unlike TextNode, changing its text doesnt render new surface, but only redraws
+    glyphs after the first changed char. This isnt faster than rendering small
+    texts, but avoids allocating a surface per change and gets slightly cheaper
+    than TextNode with larger fonts (see benchmarks/bench.py).
+    If width is set, text gets wrapped by words to fit into it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        text: str,
+        font: font.Font,
+        antialiasing: bool = True,
+        pos: Point = None,
+        color: RGB = (0, 0, 0),
+        frame: Surface = None,
+        distance: float = 0.0,
+        align: Align = Align.center,
+        font_size: int = None,
+        bold: bool = False,
+        italic: bool = False,
+        width: int = None,
+    ):
+        if font is None or isinstance(font, str):
+            font = game.assets.font(font, size=font_size, bold=bold, italic=italic)
+        self.font = font
+        self.atlas = glyph_atlases.get(font, color, antialiasing)
+        self.glyph_text = GlyphText(self.atlas, text, width)
+
+        super().__init__(
+            surface=self.glyph_text.surface,
+            pos=pos or Point(0, 0),
+            distance=distance,
+            name=name,
+            align=align,
+        )
+        self.rect.size = self.glyph_text.size
+        self.pos = self._pos
+
+        self.text = text
+        self.frame = frame
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text: str):
+        self._text = text
+        if not self.glyph_text.set(text):
+            return
+        self.surface = self.glyph_text.surface
+        # Rect gets resized around its aligned point, which is what realigning it
+        # via pos would do - minus recalculating that point from camera
+        rect = self.rect
+        if self.align is Align.topleft:
+            rect.size = self.glyph_text.size
+        elif self.align is Align.topright:
+            anchor = rect.topright
+            rect.size = self.glyph_text.size
+            rect.topright = anchor
+        else:
+            anchor = rect.center
+            rect.size = self.glyph_text.size
+            rect.center = anchor
+        if self.body is not None:
+            self.body.world.mark_moved(self.body)
+
+    def draw(self):
+        if self.frame:
+            game.screen.blit(self.frame, self.rect)
+        game.screen.blit(self.surface, self.rect, self.glyph_text.area)
+
+
 class AnimatedNode(VisualNode):
-    """Node that plays provided animation"""
+    """Node that plays provided animation.
+    Its frames are advanced by game's animation manager, while node is shown.
+    """
 
     def __init__(
         self, name: str, animation: Animation, pos: Point, distance: float = 0.0
     ):
         self.animation = animation
         super().__init__(
-            surface=self.animation.current_frame,
+            surface=self.animation.frame,
             pos=pos,
             distance=distance,
             name=name,
         )
 
-    def update(self):
-        if super().update(self):
-            nxt = self.animation.update()
-            if nxt:
-                self.surface = nxt
-            return True
-        return False
+    def show(self, play: bool = True):
+        if self.shown:
+            return
+        super().show(play)
+        anim_mgr.add(self)
+
+    def hide(self, pause: bool = True):
+        if not self.shown:
+            return
+        super().hide(pause)
+        anim_mgr.remove(self)
+
+    def update_frame(self):
+        """Swap node's surface to animation's current frame"""
+        self.surface = self.animation.frame
+        # Rotated frames may differ in size, which requires realigning the rect
+        if self.surface.get_size() != self.rect.size:
+            self.rect = self.surface.get_rect()
+            self.pos = self._pos
 
 
 class Group(Node):
@@ -279,6 +391,7 @@ class Group(Node):
         super().__init__(name=name)
 
     def add_child(self, node, show: bool = True):
+        node._parent_ref = weakref.ref(self)
         node.init()
         if show:
             node.show()
@@ -287,12 +400,32 @@ class Group(Node):
 
 
 class Scene(Node):
-    """Node with some static background"""
+    """Node with some static background.
+    Assets of its bundles are loaded on init and released once scene stops.
+    """
 
-    def __init__(self, name: str, background: Surface = None):
+    def __init__(self, name: str, background: Surface = None, bundles: list = None):
         self.background = background
+        # Names of assets bundles, registered in game's assets loader
+        self.bundles = list(bundles or [])
         super().__init__(name)
 
+    def init(self):
+        if self.initialized:
+            return
+
+        # Assets should be available by the time initmethod runs
+        for bundle in self.bundles:
+            game.assets.acquire(bundle)
+        super().init()
+
+    def stop(self):
+        was_initialized = self.initialized
+        super().stop()
+        if was_initialized:
+            for bundle in self.bundles:
+                game.assets.release(bundle)
+
     def update(self) -> bool:
         if not self.active:
             return False
@@ -309,6 +442,224 @@ class Scene(Node):
         game.screen.blit(self.background, (0, 0))
 
 
+class ScenePreloader:
+    """Initializer of scene, that prepares it in background while current one
+    keeps playing. Assets of scene's bundles get decoded on worker threads,
+    while its initmethod runs on the main thread in slices of up to budget_ms
+    per frame. To be sliced, initmethod should yield between its steps.
+    """
+
+    def __init__(
+        self,
+        scene: Scene,
+        budget_ms: float = 8,
+        workers: int = 2,
+        on_ready: callable = None,
+    ):
+        self.scene = scene
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self._on_ready = on_ready
+        self._executor = None
+        self._jobs = []
+        self._init = None
+        self.ready = False
+        # Time between start and readiness, time spent on the main thread doing
+        # preload and time spent switching to the scene. In ms
+        self.preload_ms = 0.0
+        self.frame_ms = 0.0
+        self.swap_ms = None
+        self._started = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({self.scene}, ready={self.ready})"
+
+    def _decode(self, kind: str, store, name: str) -> tuple:
+        path, loader, kwargs = store.index[name]
+        # Custom loaders (say, of packs) arent guaranteed to be thread-safe
+        if loader is not None:
+            return None
+        if kind == "images":
+            return game.assets.decode_image(
+                path, scale=kwargs.get("scale"), colorkey=kwargs.get("colorkey")
+            )
+        return store.loader(path, **kwargs)
+
+    def _finalize(self, kind: str, store, name: str, future):
+        try:
+            item = future.result()
+        except Exception as e:
+            log.warning(f"Unable to preload {name}: {e}")
+            return
+
+        if item is None:
+            # Accessing indexed asset loads it on the spot
+            try:
+                store[name]
+            except Exception as e:
+                log.warning(f"Unable to load {name}: {e}")
+            return
+        if kind == "images":
+            kwargs = store.index[name][2]
+            item = game.assets.convert_image(
+                item,
+                colorkey=kwargs.get("colorkey"),
+                has_alpha=kwargs.get("has_alpha", True),
+            )
+        store[name] = item
+
+    def start(self, task_mgr=None, name: str = None):
+        """Begin preloading, driven by provided task manager (game's by default)"""
+
+        from WGF import task_mgr as game_task_mgr
+        from WGF.tasks import Task
+
+        self._started = perf_counter()
+        scene = self.scene
+        if not scene.initialized:
+            missing = []
+            for bundle in scene.bundles:
+                missing += game.assets.acquire(bundle, load=False)
+
+            if missing:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                for kind, store, asset in missing:
+                    future = self._executor.submit(self._decode, kind, store, asset)
+                    self._jobs.append((kind, store, asset, future))
+
+        name = name or f"preload_{scene.name}"
+        task_mgr = task_mgr or game_task_mgr
+        task_mgr.tasks[name] = Task(
+            name=name, task_method=self.update, stop_condition=True
+        )
+
+    def update(self) -> bool:
+        """Advance preloading within frame's budget. Returns True once ready"""
+
+        if self.ready:
+            return True
+
+        start = perf_counter()
+        scene = self.scene
+
+        # Converting decoded assets, in order of their submission
+        while self._jobs and self._jobs[0][-1].done():
+            self._finalize(*self._jobs.pop(0))
+            if (perf_counter() - start) * 1000 >= self.budget_ms:
+                break
+
+        if not self._jobs and not scene.initialized:
+            if self._init is None:
+                result = scene._initmethod() if scene._initmethod else None
+                self._init = result if isinstance(result, GeneratorType) else iter(())
+            for _ in self._init:
+                if (perf_counter() - start) * 1000 >= self.budget_ms:
+                    break
+            else:
+                scene.initialized = True
+
+        self.frame_ms += (perf_counter() - start) * 1000
+
+        if scene.initialized:
+            self.ready = True
+            self.preload_ms = (perf_counter() - self._started) * 1000
+            if self._executor:
+                self._executor.shutdown(wait=False)
+            log.debug(
+                f"Preloaded {scene.name} in {self.preload_ms:.2f}ms, "
+                f"{self.frame_ms:.2f}ms of which were spent on main thread"
+            )
+            if self._on_ready:
+                self._on_ready()
+        return self.ready
+
+    def finish(self):
+        """Complete preloading right away, waiting for assets that are still
+        being decoded and running the rest of initmethod at once.
+        """
+
+        if self.ready:
+            return
+        while self._jobs:
+            # Results of futures are waited for, if they arent done yet
+            self._finalize(*self._jobs.pop(0))
+        budget = self.budget_ms
+        self.budget_ms = float("inf")
+        try:
+            self.update()
+        finally:
+            self.budget_ms = budget
+
+    def switch(self, name: str = None, stop: bool = True) -> float:
+        """Replace currently shown scenes with preloaded one. If its not ready
+        yet, preloading gets finished first. Returns time it took, in ms.
+        """
+
+        # Otherwise scene's init would acquire its bundles and run initmethod
+        # again, from the very beginning
+        if self._started is not None and not self.ready:
+            log.warning(f"Switching to {self.scene.name} before its preloaded")
+            self.finish()
+        self.swap_ms = tree.switch(self.scene, name=name, stop=stop)
+        return self.swap_ms
+
+
+class ProfilerOverlay(VisualNode):
+    """Node that displays stats of game's frame profiler"""
+
+    def __init__(
+        self,
+        name: str,
+        font: font.Font = None,
+        pos: Point = None,
+        color: RGB = (255, 255, 255),
+        background: RGB = (0, 0, 0),
+        refresh_ms: int = 500,
+    ):
+        self.font = font or game.assets.font(None, size=14)
+        self.color = tuple(color)
+        self.background = tuple(background)
+        # Rendering text is costly, thus its only done once in a while
+        self.refresh_ms = refresh_ms
+        self._time_left = 0
+        super().__init__(
+            name=name,
+            surface=Surface((1, 1)),
+            pos=pos or Point(0, 0),
+            align=Align.topleft,
+        )
+
+    def update(self) -> bool:
+        if not super().update():
+            return False
+
+        self._time_left -= WGF.clock.get_time()
+        if self._time_left <= 0:
+            self._time_left = self.refresh_ms
+            self.refresh()
+        return True
+
+    def refresh(self):
+        """Re-render profiler's stats"""
+
+        if not game.profiler:
+            lines = ["profiler is disabled"]
+        else:
+            lines = game.profiler.summary()
+
+        rendered = [self.font.render(i, True, self.color) for i in lines]
+        width = max(i.get_width() for i in rendered)
+        height = sum(i.get_height() for i in rendered)
+        self.surface = Surface((width, height))
+        self.surface.fill(self.background)
+        y = 0
+        for i in rendered:
+            self.surface.blit(i, (0, y))
+            y += i.get_height()
+        self.rect = self.surface.get_rect()
+        self.pos = self._pos
+
+
 class Cursor(Node):
     """Node that follows the mouse cursor"""
 
@@ -360,6 +711,9 @@ class Button(TextNode):
         frame: Surface = None,
         distance: float = 0.0,
         align: Align = Align.center,
+        font_size: int = None,
+        bold: bool = False,
+        italic: bool = False,
     ):
         super().__init__(
             name=name,
@@ -371,6 +725,9 @@ class Button(TextNode):
             frame=frame,
             distance=distance,
             align=align,
+            font_size=font_size,
+            bold=bold,
+            italic=italic,
         )
         self._clickmethod = clickmethod
 
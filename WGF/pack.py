@@ -0,0 +1,136 @@
+from pygame import image, mixer, Surface
+from pygame import font as pgfont
+from collections import namedtuple
+from io import BytesIO
+from mmap import mmap, ACCESS_READ
+from os.path import splitext
+import json
+import struct
+import logging
+
+log = logging.getLogger(__name__)
+
+# Single-file assets archive. Its layout is:
+# - header: magic, version and length of index
+# - index: json of {kind: {name: [offset, length, extension]}}
+# - data: contents of all packed files, one after another
+# Offsets are relative to the beginning of data section
+
+HEADER = struct.Struct("<4sHI")
+MAGIC = b"WGFP"
+VERSION = 1
+
+KINDS = ("image", "sound", "font")
+
+PackEntry = namedtuple("PackEntry", ["offset", "length", "extension"])
+
+
+class InvalidPack(Exception):
+    """Exception thrown if file isnt a valid assets pack"""
+
+    def __init__(self, path):
+        message = f"{path} is not a valid assets pack"
+        super().__init__(message)
+
+
+def build_pack(output, entries: list) -> dict:
+    """Pack provided (kind, name, path) entries into single file.
+    Returns resulting index.
+    """
+
+    index = {kind: {} for kind in KINDS}
+    packed = []
+    offset = 0
+    # Sorting ensures the same input always produces the same archive
+    for kind, name, path in sorted(entries):
+        if kind not in index:
+            raise ValueError(f"kind must be one of {KINDS}, not {kind}")
+        if name in index[kind]:
+            log.warning(f"Skipping {path}: {kind} {name} is already packed")
+            continue
+        with open(path, "rb") as f:
+            length = f.seek(0, 2)
+        index[kind][name] = [offset, length, splitext(path)[-1].lower()]
+        packed.append(path)
+        offset += length
+
+    raw_index = json.dumps(index).encode()
+
+    with open(output, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(raw_index)))
+        out.write(raw_index)
+        # Data is written in the same order in which offsets have been assigned
+        for path in packed:
+            with open(path, "rb") as f:
+                out.write(f.read())
+
+    log.debug(f"Packed {len(packed)} files into {output}")
+    return index
+
+
+class AssetPack:
+    """Read-only assets archive, mapped into memory"""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, "rb") as f:
+            self._mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+        try:
+            magic, version, index_length = HEADER.unpack_from(self._mm)
+        except struct.error:
+            raise InvalidPack(path)
+        if magic != MAGIC or version != VERSION:
+            raise InvalidPack(path)
+
+        start = HEADER.size
+        raw_index = json.loads(self._mm[start : start + index_length])
+        self._data_start = start + index_length
+
+        self.index = {
+            kind: {name: PackEntry(*i) for name, i in raw_index.get(kind, {}).items()}
+            for kind in KINDS
+        }
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({self.path})"
+
+    @property
+    def images(self) -> tuple:
+        return tuple(self.index["image"])
+
+    @property
+    def sounds(self) -> tuple:
+        return tuple(self.index["sound"])
+
+    @property
+    def fonts(self) -> tuple:
+        return tuple(self.index["font"])
+
+    def read(self, kind: str, name: str) -> memoryview:
+        """Get raw contents of packed file, without copying them"""
+        entry = self.index[kind][name]
+        start = self._data_start + entry.offset
+        return memoryview(self._mm)[start : start + entry.length]
+
+    def open(self, kind: str, name: str) -> BytesIO:
+        """Get packed file as file-like object"""
+        return BytesIO(self.read(kind, name))
+
+    def get_image(self, name: str) -> Surface:
+        """Decode packed image. Its not converted to display's format"""
+        entry = self.index["image"][name]
+        return image.load(self.open("image", name), f"{name}{entry.extension}")
+
+    def get_sound(self, name: str) -> mixer.Sound:
+        """Get packed sound"""
+        return mixer.Sound(file=self.open("sound", name))
+
+    def get_font(self, name: str, size: int) -> pgfont.Font:
+        """Get packed font of provided size"""
+        # Font keeps reading from its file object, so it has to stay alive
+        return pgfont.Font(self.open("font", name), size)
+
+    def close(self):
+        self._mm.close()
@@ -0,0 +1,173 @@
+from pygame import Surface, image
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from weakref import finalize
+from time import perf_counter
+import WGF
+import logging
+
+log = logging.getLogger(__name__)
+
+# Generation of surfaces in worker processes. Each job gets a shared memory block
+# sized to fit its pixels, which worker fills in place. Once job is done, frame
+# thread wraps that very block into Surface - so pixels are never copied or
+# pickled between processes. Block stays alive for as long as its Surface does
+
+# Bytes per pixel of formats supported by pygame.image.frombuffer
+FORMATS = {"RGB": 3, "BGR": 3, "RGBX": 4, "RGBA": 4, "ARGB": 4}
+
+
+def _generate(func: callable, name: str, size: tuple, args: tuple, kwargs: dict):
+    # Runs in worker process
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        func(block.buf, size, *args, **kwargs)
+    finally:
+        block.close()
+
+
+def _release(block: shared_memory.SharedMemory):
+    block.close()
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SurfaceGenerator:
+    """Runner of procedural surface generators on a pool of processes.
+
+    Generators should be picklable (module-level) functions, that accept writable
+    buffer, (width, height) size and any other provided arguments. Buffer should
+    be filled with rows of pixels in generator's format, say via
+    numpy.frombuffer(buffer, numpy.uint8).reshape(height, width, 4).
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers
+        # Pool is started on first submit, since spawning processes isnt free
+        self._executor = None
+        # (block, size, format, callback, future, start time) of pending jobs
+        self._pending = []
+        # Blocks of surfaces that got garbage collected. Finalizers run before
+        # surface releases its buffer, thus these are closed on next update
+        self._retired = []
+        self._task = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({len(self._pending)} pending)"
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(
+        self,
+        func: callable,
+        size: tuple,
+        *args,
+        callback: callable = None,
+        format: str = "RGBA",
+        **kwargs,
+    ):
+        """Schedule generation of surface of provided size. Once its ready,
+        callback will receive it on frame thread.
+        """
+
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {tuple(FORMATS)}, not {format}")
+        width, height = size
+        length = width * height * FORMATS[format]
+        if length <= 0:
+            raise ValueError(f"Unable to generate surface of size {tuple(size)}")
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        block = shared_memory.SharedMemory(create=True, size=length)
+        try:
+            future = self._executor.submit(
+                _generate, func, block.name, (width, height), args, kwargs
+            )
+        except Exception:
+            _release(block)
+            raise
+        self._pending.append(
+            (block, (width, height), format, callback, future, perf_counter())
+        )
+        return future
+
+    def _finalize(self, block, size: tuple, format: str, future) -> Surface:
+        try:
+            future.result()
+        except Exception as e:
+            _release(block)
+            log.warning(f"Unable to generate surface: {e}")
+            return None
+
+        # Block may be larger than requested, since its rounded up to pages
+        length = size[0] * size[1] * FORMATS[format]
+        surface = image.frombuffer(block.buf[:length], size, format)
+        # Name isnt needed anymore - existing mapping remains valid until closed
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+        finalize(surface, self._retired.append, block)
+        return surface
+
+    def _close_retired(self):
+        retired = []
+        for block in self._retired:
+            try:
+                block.close()
+            except BufferError:
+                retired.append(block)
+        self._retired = retired
+
+    def update(self):
+        """Pass finished surfaces to their callbacks. Should be called each frame"""
+
+        if self._retired:
+            self._close_retired()
+        if not self._pending:
+            return
+
+        pending = []
+        for item in self._pending:
+            block, size, format, callback, future, start = item
+            if not future.done():
+                pending.append(item)
+                continue
+            surface = self._finalize(block, size, format, future)
+            if surface is None:
+                continue
+            log.debug(
+                f"Generated {size[0]}x{size[1]} surface in "
+                f"{(perf_counter() - start) * 1000:.2f}ms"
+            )
+            if callback:
+                callback(surface)
+        self._pending = pending
+
+    def start(self, task_mgr=None, name: str = "surface_generator"):
+        """Make provided task manager (game's one by default) update generator"""
+
+        from WGF.tasks import Task
+
+        task_mgr = task_mgr or WGF.task_mgr
+        self._task = Task(name=name, task_method=self.update)
+        task_mgr.tasks[name] = self._task
+
+    def stop(self, wait: bool = True):
+        """Shut worker processes down and drop unfinished jobs"""
+
+        if self._task:
+            self._task.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        for block, *_ in self._pending:
+            _release(block)
+        self._pending = []
+        self._close_retired()
@@ -0,0 +1,333 @@
+from time import perf_counter_ns
+from collections import deque
+from functools import wraps
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+# Frame profiler and tracer. Timings are stored in nanoseconds, but reported in
+# ms (or in us, in case of traces - since thats what trace format expects)
+
+
+class RingBuffer:
+    """Fixed-size storage of latest values"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._values = [0] * size
+        self._pos = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self._values[self._pos] = value
+        self._pos = (self._pos + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def values(self) -> list:
+        """Get stored values, from oldest to newest"""
+        if self.count < self.size:
+            return self._values[: self.count]
+        return self._values[self._pos :] + self._values[: self._pos]
+
+    def clear(self):
+        self._pos = 0
+        self.count = 0
+
+
+def _percentile(ordered: list, pct: float):
+    # Nearest-rank percentile of already sorted values
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class FrameProfiler:
+    """Profiler that times each phase of game's frames"""
+
+    # Phases of GameWindow's frame, in order of their execution
+    phases = ("tick", "tasks", "animations", "events", "update", "draw", "flip")
+
+    def __init__(self, size: int = 600, budget_ms: float = None):
+        self.size = size
+        # Frames that take longer than that are counted as over budget
+        self.budget_ms = budget_ms
+        self.buffers = {phase: RingBuffer(size) for phase in self.phases}
+        self.buffers["frame"] = RingBuffer(size)
+        self.frames = 0
+        self.over_budget = 0
+        self._frame_start = 0
+        self._last = 0
+
+    def begin_frame(self):
+        self._frame_start = self._last = perf_counter_ns()
+
+    def mark(self, phase: str):
+        """Save time passed since previous mark (or frame's start) as phase's"""
+        now = perf_counter_ns()
+        self.buffers[phase].append(now - self._last)
+        self._last = now
+
+    def end_frame(self):
+        duration = perf_counter_ns() - self._frame_start
+        self.buffers["frame"].append(duration)
+        self.frames += 1
+        if self.budget_ms is not None and duration > self.budget_ms * 1_000_000:
+            self.over_budget += 1
+
+    def stats(self, phase: str) -> dict:
+        """Get rolling avg/p50/p95/p99/max of provided phase, in ms"""
+
+        values = sorted(self.buffers[phase].values())
+        if not values:
+            return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+        return {
+            "avg": sum(values) / len(values) / 1_000_000,
+            "p50": _percentile(values, 50) / 1_000_000,
+            "p95": _percentile(values, 95) / 1_000_000,
+            "p99": _percentile(values, 99) / 1_000_000,
+            "max": values[-1] / 1_000_000,
+        }
+
+    def report(self) -> dict:
+        """Get stats of all phases and whole frames"""
+
+        data = {phase: self.stats(phase) for phase in self.buffers}
+        data["frames"] = self.frames
+        data["over_budget"] = self.over_budget
+        return data
+
+    def summary(self) -> list:
+        """Get human-readable lines with stats of each phase"""
+
+        lines = []
+        for phase in self.buffers:
+            s = self.stats(phase)
+            lines.append(
+                f"{phase}: avg {s['avg']:.2f} p50 {s['p50']:.2f} "
+                f"p95 {s['p95']:.2f} p99 {s['p99']:.2f} max {s['max']:.2f}"
+            )
+        lines.append(f"over budget: {self.over_budget}/{self.frames}")
+        return lines
+
+    def reset(self):
+        for buffer in self.buffers.values():
+            buffer.clear()
+        self.frames = 0
+        self.over_budget = 0
+
+
+class Tracer:
+    """Opt-in tracer of nodes' updates/draws, tasks and scheduled callbacks.
+    Keeps spans of last few sampled frames, that can be dumped in Chrome's trace
+    event format (viewable with chrome://tracing or Perfetto).
+    """
+
+    def __init__(self, frames: int = 60, sample_every: int = 1):
+        # Only each sample_every'th frame is traced. Others only cost a check
+        self.sample_every = sample_every if sample_every > 0 else 1
+        self._frames = deque(maxlen=frames)
+        # Spans of currently traced frame. None if frame isnt sampled
+        self._current = None
+        self._nodes = []
+        self._patched = []
+        self._wrapped_methods = []
+        self._count = 0
+        self._origin = perf_counter_ns()
+        self.enabled = False
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({len(self._frames)} frames)"
+
+    @property
+    def path(self) -> str:
+        """Path of node that is currently being processed"""
+        return "/".join(node.name for node in self._nodes)
+
+    def begin_frame(self):
+        self._count += 1
+        if self._count % self.sample_every == 0:
+            self._current = []
+
+    def end_frame(self):
+        if self._current is not None:
+            self._frames.append(self._current)
+        self._current = None
+
+    def _record(self, events: list, name: str, cat: str, start: int, args: dict):
+        end = perf_counter_ns()
+        events.append((name, cat, start - self._origin, end - start, args))
+
+    def wrap(self, func: callable, name: str, cat: str) -> callable:
+        """Wrap function into one that records its spans while frame is traced"""
+
+        tracer = self
+
+        @wraps(func)
+        def traced(*args, **kwargs):
+            events = tracer._current
+            if events is None:
+                return func(*args, **kwargs)
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer._record(events, name, cat, start, {"path": tracer.path})
+
+        traced._traced = True
+        return traced
+
+    def _wrap_node_method(self, func: callable, method: str) -> callable:
+        tracer = self
+
+        @wraps(func)
+        def traced(node, *args, **kwargs):
+            events = tracer._current
+            if events is None:
+                return func(node, *args, **kwargs)
+
+            # Overriden methods call their parents - these shouldnt nest paths
+            nested = bool(tracer._nodes) and tracer._nodes[-1] is node
+            if not nested:
+                tracer._nodes.append(node)
+            path = tracer.path
+
+            # Callbacks are set per-instance, so they get wrapped on first sight
+            callback = node.__dict__.get("_updatemethod")
+            if callback is not None and not getattr(callback, "_traced", False):
+                node._updatemethod = tracer.wrap(
+                    callback, f"{node.name}._updatemethod", "updatemethod"
+                )
+                tracer._wrapped_methods.append((node, callback))
+
+            start = perf_counter_ns()
+            try:
+                return func(node, *args, **kwargs)
+            finally:
+                if not nested:
+                    tracer._nodes.pop()
+                tracer._record(
+                    events,
+                    f"{type(node).__name__}.{method}",
+                    method,
+                    start,
+                    {"path": path, "type": type(node).__name__},
+                )
+
+        traced._traced = True
+        return traced
+
+    def _patch(self, owner, attr: str, wrapped: callable):
+        self._patched.append((owner, attr, owner.__dict__.get(attr)))
+        setattr(owner, attr, wrapped)
+
+    def enable(self, game=None):
+        """Start tracing provided game (current one by default)"""
+
+        import WGF
+        from WGF.base import NodeBase
+        from WGF.tasks import Task, TaskManager
+
+        if self.enabled:
+            return self
+        game = game or WGF.game
+
+        classes = [NodeBase]
+        for cls in classes:
+            classes += cls.__subclasses__()
+            for attr in ("update", "update_nodes", "draw"):
+                if attr in cls.__dict__:
+                    self._patch(
+                        cls, attr, self._wrap_node_method(cls.__dict__[attr], attr)
+                    )
+
+        classes = [Task]
+        for cls in classes:
+            classes += cls.__subclasses__()
+            if "update" in cls.__dict__:
+                self._patch(
+                    cls,
+                    "update",
+                    self.wrap(cls.__dict__["update"], f"{cls.__name__}.update", "task"),
+                )
+
+        do_later = TaskManager.do_later
+        tracer = self
+
+        def traced_do_later(mgr, ms: int):
+            def wrapper(func):
+                return do_later(mgr, ms)(
+                    tracer.wrap(func, f"{func.__name__} (do_later)", "do_later")
+                )
+
+            return wrapper
+
+        self._patch(TaskManager, "do_later", traced_do_later)
+
+        # Frames are wrapped on game's instance, so other games arent affected
+        for attr in ("_frame", "_profiled_frame"):
+            method = getattr(game, attr)
+
+            def traced_frame(method=method):
+                tracer.begin_frame()
+                try:
+                    method()
+                finally:
+                    tracer.end_frame()
+
+            self._patch(game, attr, traced_frame)
+
+        self.enabled = True
+        return self
+
+    def disable(self):
+        """Stop tracing and restore original methods"""
+
+        for owner, attr, original in reversed(self._patched):
+            if original is None:
+                delattr(owner, attr)
+            else:
+                setattr(owner, attr, original)
+        self._patched = []
+
+        for node, callback in self._wrapped_methods:
+            node._updatemethod = callback
+        self._wrapped_methods = []
+
+        self._current = None
+        self._nodes = []
+        self.enabled = False
+
+    def to_dict(self) -> dict:
+        """Get recorded spans as Chrome trace events"""
+
+        events = []
+        for frame in self._frames:
+            for name, cat, start, duration, args in frame:
+                events.append(
+                    {
+                        "name": name,
+                        "cat": cat,
+                        "ph": "X",
+                        "ts": start / 1000,
+                        "dur": duration / 1000,
+                        "pid": 0,
+                        "tid": 0,
+                        "args": args,
+                    }
+                )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        """Save recorded spans into provided json file"""
+
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+        log.debug(f"Saved trace of {len(self._frames)} frames to {path}")
+
+    def clear(self):
+        self._frames.clear()
@@ -1,12 +1,15 @@
-from WGF import clock
-from pygame import transform, sprite
+import WGF
+from pygame import transform, sprite, Surface
 from enum import Enum
 from collections import namedtuple
+from weakref import WeakKeyDictionary
+from WGF.base import is_reachable
 import logging
 
 log = logging.getLogger(__name__)
 
-# Tasks that require game's clock tickin'
+# Tasks that require game's clock tickin'. Clock is always fetched from WGF, since
+# it may be replaced (say, with FixedClock for headless simulations)
 
 
 class TaskStatus(Enum):
@@ -30,7 +33,7 @@ class Timer:
         if self.status is not TaskStatus.active:
             return self.completion
 
-        self.time_left -= clock.get_time()
+        self.time_left -= WGF.clock.get_time()
         if self.time_left <= 0:
             self.status = TaskStatus.stopped
             self.completion = True
@@ -213,11 +216,76 @@ class TaskManager:
         return wrapper
 
 
+class FrameCache:
+    """Process-wide storage of transformed animation frames"""
+
+    def __init__(self, rotation_step: int = 1):
+        # Source surface -> {(scale, flip_x, flip_y, rotation step): surface}.
+        # Weak keys ensure transformed copies die together with their source
+        self._storage = WeakKeyDictionary()
+        # Rotation angles get snapped to multiples of this value, so slightly
+        # different angles dont spawn hundreds of near-identical copies
+        self.rotation_step = rotation_step if rotation_step > 0 else 1
+
+    def __len__(self):
+        return sum(len(i) for i in self._storage.values())
+
+    def _to_step(self, angle: float) -> int:
+        return round(angle / self.rotation_step) % round(360 / self.rotation_step)
+
+    def get(
+        self,
+        surface: Surface,
+        scale: int = None,
+        flip_x: bool = False,
+        flip_y: bool = False,
+        rotation: float = 0,
+    ) -> Surface:
+        """Get transformed copy of provided surface, making it if necessary"""
+
+        scale = scale or None
+        step = self._to_step(rotation)
+        key = (scale, bool(flip_x), bool(flip_y), step)
+        if key == (None, False, False, 0):
+            return surface
+
+        cache = self._storage.setdefault(surface, {})
+        if key in cache:
+            return cache[key]
+
+        # Each transformation is built on top of cached result of previous one,
+        # thus flipped and rotated variants of same sprite share scaled base
+        if step:
+            img = transform.rotate(
+                self.get(surface, scale, flip_x, flip_y),
+                step * self.rotation_step,
+            )
+        elif flip_x or flip_y:
+            img = transform.flip(self.get(surface, scale), flip_x, flip_y)
+        else:
+            x, y = surface.get_size()
+            img = transform.scale(surface, (x * scale, y * scale))
+
+        cache[key] = img
+        return img
+
+    def get_frames(self, sprites: list, **kwargs) -> list:
+        """Get transformed copies of all provided sprites"""
+        return [self.get(spr, **kwargs) for spr in sprites]
+
+    def clear(self):
+        """Drop all cached frames"""
+        self._storage.clear()
+
+
+# Shared between all animations, so hundreds of identical enemies will reuse
+# the same scaled/flipped frames instead of keeping their own copies
+frame_cache = FrameCache()
+
+
 class Animation:
     """Animation consisting of multiple sprites"""
 
-    # #TODO: add storage to keep flipped sprites
-
     def __init__(
         self,
         sprites: list,
@@ -226,15 +294,14 @@ class Animation:
         scale: int = None,
         speed: float = 160,
     ):
+        # Original, untransformed sprites. Everything else is fetched from cache
+        self.source = list(sprites)
+        self.scale = scale
+        self.flipped_x = False
+        self.flipped_y = False
+        self.rotation = 0
+        self._apply_transforms()
 
-        if scale:
-            # This will fail if size of sprites is not the same
-            x, y = sprites[0].get_size()
-            x = x * scale
-            y = y * scale
-            sprites = [transform.scale(img, (x, y)) for img in sprites]
-
-        self.sprites = sprites
         self.loop = loop
         self.current_frame = default_frame
         self.timer = Timer(speed)
@@ -246,23 +313,103 @@ class Animation:
     def __getitem__(self, key: int):
         return self.sprites[key]
 
-    def update(self):
-        if not self.timer.update():
-            return None
-        self.timer.restart()
+    def _apply_transforms(self):
+        self.sprites = frame_cache.get_frames(
+            self.source,
+            scale=self.scale,
+            flip_x=self.flipped_x,
+            flip_y=self.flipped_y,
+            rotation=self.rotation,
+        )
 
-        if self.current_frame == len(self.sprites):
-            if not self.loop:
-                return None
+    @property
+    def frame(self) -> Surface:
+        """Currently displayed sprite"""
+        return self.sprites[self.current_frame]
+
+    def advance(self, ms: int) -> bool:
+        """Advance animation by provided amount of time.
+        Returns True if displayed frame has changed.
+        """
+        timer = self.timer
+        if timer.status is not TaskStatus.active:
+            return False
+
+        timer.time_left -= ms
+        if timer.time_left > 0:
+            return False
+
+        # On long frames we may need to skip more than one sprite at once
+        if timer._time:
+            steps = 1 + int(-timer.time_left // timer._time)
+            timer.time_left += steps * timer._time
+        else:
+            steps = 1
+            timer.time_left = 0
+
+        frame = self.current_frame + steps
+        length = len(self.sprites)
+        if frame >= length:
+            if self.loop:
+                frame %= length
             else:
-                self.current_frame = 0
+                frame = length - 1
+                timer.status = TaskStatus.stopped
 
-        img = self.sprites[self.current_frame]
-        self.current_frame += 1
-        return img
+        if frame == self.current_frame:
+            return False
+        self.current_frame = frame
+        return True
+
+    def update(self):
+        """Update animation with game's clock. Returns new sprite, if any"""
+        if self.advance(WGF.clock.get_time()):
+            return self.frame
+        return None
 
     def flip(self, horizontally: bool = False, vertically: bool = False):
+        """Flip animation's sprites relatively to their current state"""
         if horizontally or vertically:
-            self.sprites = [
-                transform.flip(spr, horizontally, vertically) for spr in self.sprites
-            ]
+            self.flipped_x ^= bool(horizontally)
+            self.flipped_y ^= bool(vertically)
+            self._apply_transforms()
+
+    def rotate(self, angle: float):
+        """Set rotation of animation's sprites, in degrees counterclockwise"""
+        self.rotation = angle
+        self._apply_transforms()
+
+
+class AnimationManager:
+    """Manager that advances all registered animations at once.
+    Only animations of nodes attached to scene tree via active ancestors advance.
+    """
+
+    def __init__(self):
+        # Owner node -> its animation. Keys are weak, so nodes of dropped scenes
+        # dont linger here. Insertion order is preserved, so nodes are always
+        # processed in order of their registration
+        self.nodes = WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node, animation: Animation = None):
+        """Register node's animation"""
+        self.nodes[node] = animation or node.animation
+
+    def remove(self, node):
+        """Unregister node's animation, if it was registered"""
+        self.nodes.pop(node, None)
+
+    def update(self, ms: int = None) -> list:
+        """Advance all animations of active nodes by single frame time sample.
+        Returns nodes, whose displayed frame has changed.
+        """
+        ms = WGF.clock.get_time() if ms is None else ms
+        known = {}
+        return [
+            node
+            for node, animation in list(self.nodes.items())
+            if node.active and is_reachable(node, known) and animation.advance(ms)
+        ]
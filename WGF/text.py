@@ -0,0 +1,401 @@
+from pygame import Surface, Rect, SRCALPHA
+from pygame import BLEND_RGBA_ADD, BLEND_RGBA_MAX, BLEND_RGBA_MIN
+from pygame import font as pgfont
+from collections import namedtuple, OrderedDict
+from weakref import WeakKeyDictionary, ref
+import logging
+
+log = logging.getLogger(__name__)
+
+# Text rendering via glyph atlases. Each glyph of some font and color is rendered
+# once into a shared atlas page, after which strings are drawn as batches of
+# blits from these pages - thus changing text doesnt allocate new surfaces
+
+# Page of atlas, glyph's area on it and horizontal advance of pen after it
+Glyph = namedtuple("Glyph", ["page", "area", "advance"])
+# Size of whole text and (page, (x, y), area) blits relative to its topleft
+TextLayout = namedtuple("TextLayout", ["size", "blits"])
+
+
+class GlyphAtlas:
+    """Cache of glyphs of single font, color and antialiasing mode"""
+
+    def __init__(
+        self,
+        font: pgfont.Font,
+        color: tuple = (0, 0, 0),
+        antialiasing: bool = True,
+        page_size: int = 512,
+        cache_size: int = 256,
+        kerning: bool = True,
+    ):
+        # Registry keys atlases by their fonts weakly, thus atlas itself must not
+        # keep its font alive either
+        self._font = ref(font)
+        self.color = tuple(color)
+        self.antialiasing = antialiasing
+        self.page_size = page_size
+        self.line_height = font.get_linesize()
+        self.height = font.get_height()
+        self.pages = []
+        # Char -> Glyph and char -> its advance, for lookups of layout loops
+        self.glyphs = {}
+        self.advances = {}
+        # Pair of chars -> adjustment of advance between them. Skipping these
+        # makes layouts faster, but glyphs of some pairs may end up too far apart
+        self.use_kerning = kerning
+        self._kerning = {}
+        # (text, width) -> TextLayout, from least to most recently used
+        self._layouts = OrderedDict()
+        self.cache_size = cache_size
+        # Position of next glyph on the last page and height of its current row
+        self._pen_x = self._pen_y = self._row_height = 0
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}: ({len(self.glyphs)} glyphs, "
+            f"{len(self.pages)} pages)"
+        )
+
+    @property
+    def font(self) -> pgfont.Font:
+        font = self._font()
+        if font is None:
+            raise ReferenceError(f"Font of {self} has already been garbage collected")
+        return font
+
+    def _new_page(self, width: int, height: int):
+        size = max(self.page_size, width), max(self.page_size, height)
+        self.pages.append(Surface(size, SRCALPHA))
+        self._pen_x = self._pen_y = self._row_height = 0
+
+    def _allocate(self, width: int, height: int) -> tuple:
+        # Glyphs are packed into rows (shelves) of current page
+        if not self.pages:
+            self._new_page(width, height)
+        page = self.pages[-1]
+        if self._pen_x + width > page.get_width():
+            self._pen_x = 0
+            self._pen_y += self._row_height
+            self._row_height = 0
+        if self._pen_y + height > page.get_height():
+            self._new_page(width, height)
+            page = self.pages[-1]
+
+        x, y = self._pen_x, self._pen_y
+        self._pen_x += width
+        self._row_height = max(self._row_height, height)
+        return page, x, y
+
+    def glyph(self, char: str) -> Glyph:
+        """Get glyph of provided char, rendering it if necessary"""
+
+        glyph = self.glyphs.get(char)
+        if glyph is not None:
+            return glyph
+
+        advance = self.font.size(char)[0]
+        if char.isspace():
+            glyph = Glyph(None, None, advance)
+        else:
+            img = self.font.render(char, self.antialiasing, self.color)
+            page, x, y = self._allocate(*img.get_size())
+            if img.get_flags() & SRCALPHA:
+                # Regular blit would blend glyph's edges with empty page
+                page.blit(img, (x, y), special_flags=BLEND_RGBA_ADD)
+            else:
+                page.blit(img, (x, y))
+            glyph = Glyph(page, Rect((x, y), img.get_size()), advance)
+        self.glyphs[char] = glyph
+        self.advances[char] = advance
+        return glyph
+
+    def kerning(self, left: str, right: str) -> int:
+        """Get adjustment of distance between two chars"""
+
+        pair = left + right
+        value = self._kerning.get(pair)
+        if value is None:
+            value = (
+                self.font.size(pair)[0]
+                - self.glyph(left).advance
+                - self.glyph(right).advance
+            )
+            self._kerning[pair] = value
+        return value
+
+    def measure(self, line: str) -> int:
+        """Get width of single line of text"""
+
+        width = 0
+        previous = None
+        for char in line:
+            if previous is not None and self.use_kerning:
+                width += self.kerning(previous, char)
+            advance = self.advances.get(char)
+            width += self.glyph(char).advance if advance is None else advance
+            previous = char
+        return width
+
+    def wrap(self, line: str, width: int) -> list:
+        """Split line into ones that fit into provided width, by words.
+        Words longer than width get lines of their own.
+        """
+
+        lines = []
+        current = ""
+        for word in line.split(" "):
+            candidate = f"{current} {word}" if current else word
+            if current and self.measure(candidate) > width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+        return lines
+
+    def layout(self, text: str, width: int = None) -> TextLayout:
+        """Get positions of glyphs of (possibly multi-line) text"""
+
+        key = (text, width)
+        layout = self._layouts.get(key)
+        if layout is not None:
+            self._layouts.move_to_end(key)
+            return layout
+
+        lines = []
+        for line in text.split("\n"):
+            lines += self.wrap(line, width) if width else [line]
+
+        # This runs each time text changes, thus lookups are inlined
+        glyphs = self.glyphs
+        advances = self.advances
+        kerning = self._kerning if self.use_kerning else None
+        blits = []
+        text_width = 0
+        y = 0
+        for line in lines:
+            x = 0
+            previous = ""
+            for char in line:
+                advance = advances.get(char)
+                if advance is None:
+                    advance = self.glyph(char).advance
+                if previous and kerning is not None:
+                    adjustment = kerning.get(previous + char)
+                    if adjustment is None:
+                        adjustment = self.kerning(previous, char)
+                    x += adjustment
+                page, area, _ = glyphs[char]
+                if page is not None:
+                    blits.append((page, (x, y), area))
+                x += advance
+                previous = char
+            if x > text_width:
+                text_width = x
+            y += self.line_height
+
+        # Last line doesnt need spacing below it
+        height = y - self.line_height + self.height
+        layout = TextLayout((text_width, height), blits)
+        self._layouts[key] = layout
+        if len(self._layouts) > self.cache_size:
+            self._layouts.popitem(last=False)
+        return layout
+
+    def draw(self, target: Surface, text: str, pos: tuple, width: int = None) -> Rect:
+        """Draw text onto target surface, with its topleft at pos"""
+
+        layout = self.layout(text, width)
+        x, y = pos
+        target.blits(
+            [(page, (x + gx, y + gy), area) for page, (gx, gy), area in layout.blits],
+            doreturn=False,
+        )
+        return Rect((x, y), layout.size)
+
+    def clear(self):
+        self.pages = []
+        self.glyphs.clear()
+        self.advances.clear()
+        self._kerning.clear()
+        self._layouts.clear()
+        self._pen_x = self._pen_y = self._row_height = 0
+
+
+class GlyphText:
+    """Text, composed from glyphs of atlas onto surface of its own.
+    Changing text only redraws glyphs that follow the first changed char of each
+    changed line, thus updating counters and timers costs a single batch of
+    blits instead of a new surface. Its about as fast as rendering these anew,
+    thus the gain is in allocations rather than time spent.
+    If width is set, text gets wrapped by words to fit into it.
+    Surface may be wider than text, thus only its area should be blitted.
+    """
+
+    # Surface's width is rounded up to multiple of this. Thus text, which width
+    # fluctuates slightly (counters, timers), doesnt reallocate it on each change
+    canvas_step = 32
+
+    def __init__(self, atlas: GlyphAtlas, text: str = "", width: int = None):
+        self.atlas = atlas
+        self.width = width
+        self.text = None
+        self.size = (0, 0)
+        self.surface = Surface((0, 0), SRCALPHA)
+        # Part of surface that should be blitted. Its width is rounded up to
+        # even, since pygame blits odd widths much slower
+        self.area = Rect(0, 0, 0, 0)
+        # Transparent surface as wide as text, that changed parts of lines get
+        # cleared with. Blending it is cheaper than filling these
+        self._blank = self.surface
+        # Lines of text, x of each of their chars' glyphs and their widths
+        self._lines = []
+        self._positions = []
+        self._widths = []
+        self.set(text)
+
+    def __repr__(self):
+        return f"{type(self).__name__}: ({self.text!r})"
+
+    def set(self, text: str) -> bool:
+        """Change text. Returns True if its size has changed"""
+
+        if text == self.text:
+            return False
+        self.text = text
+
+        atlas = self.atlas
+        lines = text.split("\n")
+        if self.width:
+            lines = [line for i in lines for line in atlas.wrap(i, self.width)]
+        old_lines = self._lines
+        positions = self._positions
+        widths = self._widths
+        count = len(old_lines)
+        # Glyphs may be taller than font, thus bottom of the last line could have
+        # been cut off by previous surface. If there are lines below it now, its
+        # redrawn from scratch
+        grown = -1
+        if len(lines) > count:
+            grown = count - 1
+        elif len(lines) < count:
+            count = len(lines)
+            del positions[count:]
+            del widths[count:]
+
+        # This runs each time text changes, thus lookups are inlined
+        advances = atlas.advances
+        glyphs = atlas.glyphs
+        kerning = atlas._kerning if atlas.use_kerning else None
+        line_height = atlas.line_height
+        blank = self._blank
+        # Changed parts of lines get cleared, before their glyphs are drawn
+        cleared = []
+        blits = []
+        for num, line in enumerate(lines):
+            if num < count:
+                old = old_lines[num]
+                if line == old and num != grown:
+                    continue
+                y = num * line_height
+                xs = positions[num]
+                # Texts usually change near their ends (counters, timers), thus
+                # common prefix is searched from there. Its cost is proportional
+                # to the part of line that gets redrawn anyway
+                start = len(old) if len(old) < len(line) else len(line)
+                while old[:start] != line[:start]:
+                    start -= 1
+                if start < len(old):
+                    cleared.append((blank, (xs[start], y), None, BLEND_RGBA_MIN))
+                    # Glyphs are as wide as their advances, but kerning may make
+                    # these overlap cleared area. Such neighbours get redrawn too
+                    x = xs[start]
+                    while start and xs[start - 1] + advances[old[start - 1]] > x:
+                        start -= 1
+                if num == grown:
+                    start = 0
+                del xs[start:]
+            else:
+                y = num * line_height
+                xs = []
+                positions.append(xs)
+                widths.append(0)
+                start = 0
+
+            if start:
+                previous = line[start - 1]
+                x = xs[-1] + advances[previous]
+            else:
+                previous = ""
+                x = 0
+            for char in line[start:]:
+                page, area, advance = glyphs.get(char) or atlas.glyph(char)
+                if previous and kerning is not None:
+                    adjustment = kerning.get(previous + char)
+                    if adjustment is None:
+                        adjustment = atlas.kerning(previous, char)
+                    x += adjustment
+                xs.append(x)
+                if page is not None:
+                    blits.append((page, (x, y), area, BLEND_RGBA_MAX))
+                x += advance
+                previous = char
+            widths[num] = x
+        self._lines = lines
+
+        width = max(widths)
+        height = (len(lines) - 1) * line_height + atlas.height
+        surface = self.surface
+        # Surface is always sized after text, thus its unchanged with the latter
+        if self.size == (width, height):
+            surface.blits(cleared + blits, doreturn=False)
+            return False
+
+        step = self.canvas_step
+        canvas_width = -(-width // step) * step
+        if surface.get_size() == (canvas_width, height):
+            surface.blits(cleared + blits, doreturn=False)
+        else:
+            # Unchanged lines are copied from previous surface. Blank only has to
+            # cover its width, since anything beyond that is transparent anyway
+            self.surface = Surface((canvas_width, height), SRCALPHA)
+            if canvas_width > blank.get_width() or line_height > blank.get_height():
+                self._blank = Surface((canvas_width, line_height), SRCALPHA)
+            blits[:0] = [(surface, (0, 0), None, BLEND_RGBA_MAX)] + cleared
+            self.surface.blits(blits, doreturn=False)
+
+        self.size = (width, height)
+        self.area.size = (width + width % 2, height)
+        return True
+
+
+class AtlasRegistry:
+    """Storage of glyph atlases, shared by everything that uses the same font"""
+
+    def __init__(self):
+        # Font -> {(color, antialiasing): atlas}. Atlases die with their fonts
+        self._storage = WeakKeyDictionary()
+
+    def __len__(self):
+        return sum(len(i) for i in self._storage.values())
+
+    def get(
+        self,
+        font: pgfont.Font,
+        color: tuple = (0, 0, 0),
+        antialiasing: bool = True,
+    ) -> GlyphAtlas:
+        atlases = self._storage.setdefault(font, {})
+        key = (tuple(color), bool(antialiasing))
+        atlas = atlases.get(key)
+        if atlas is None:
+            atlas = GlyphAtlas(font, key[0], key[1])
+            atlases[key] = atlas
+        return atlas
+
+    def clear(self):
+        self._storage.clear()
+
+
+glyph_atlases = AtlasRegistry()
@@ -0,0 +1,186 @@
+from pygame import Surface, SRCALPHA, BLEND_RGBA_ADD, RLEACCEL
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
+from os import stat
+from time import perf_counter
+from WGF.masks import mask_cache
+import WGF
+import logging
+
+log = logging.getLogger(__name__)
+
+# Polling-based hot-reload of assets. Works with any filesystem, since it doesnt
+# rely on platform-specific notifications - just on files' mtimes and sizes
+
+ReloadReport = namedtuple("ReloadReport", ["path", "name", "load_ms", "swap_ms"])
+
+
+def replace_surface(old: Surface, new: Surface) -> bool:
+    """Copy pixels of new surface into the old one, if their sizes match.
+    Returns True on success.
+    """
+
+    if old.get_size() != new.get_size():
+        return False
+
+    # Mask of old pixels would otherwise keep being used for collisions
+    mask_cache.forget(old)
+
+    if old.get_flags() & new.get_flags() & SRCALPHA:
+        # Regular blit would blend new pixels with old ones
+        old.fill((0, 0, 0, 0))
+        old.blit(new, (0, 0), special_flags=BLEND_RGBA_ADD)
+    else:
+        # Colorkey has to be dropped for the copy, otherwise old pixels would
+        # remain in place of new keyed ones
+        key = new.get_colorkey()
+        new.set_colorkey(None)
+        old.blit(new, (0, 0))
+        if key is None:
+            old.set_colorkey(None)
+        else:
+            old.set_colorkey(key, RLEACCEL)
+    return True
+
+
+class AssetWatcher:
+    """Watcher that reloads changed assets of provided loader.
+    Checking files and decoding them happens on separate thread, while frame
+    thread only converts new images and swaps them into storages.
+    """
+
+    def __init__(self, assets, interval: int = 1000, workers: int = 1):
+        self.assets = assets
+        # How often (in ms) files should be checked for changes
+        self.interval = interval
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # Path -> (mtime, size) of watched files
+        self._known = {}
+        self._time_left = 0
+        self._check = None
+        self._pending = []
+        self._task = None
+        # Reports of recent reloads, from oldest to newest
+        self.reports = []
+
+    def _sources(self) -> list:
+        sources = []
+        assets = self.assets
+        for kind, store in (
+            ("image", assets.images),
+            ("sound", assets.sounds),
+            ("font", assets.fonts),
+        ):
+            for name, (path, loader, kwargs) in store.index.items():
+                # Assets with custom loaders (say, from packs) cant be watched
+                if loader is None and store.is_loaded(name):
+                    sources.append((kind, store, name, path, kwargs))
+        return sources
+
+    def _find_changed(self, sources: list) -> list:
+        changed = []
+        for source in sources:
+            path = source[3]
+            try:
+                st = stat(path)
+            except OSError:
+                continue
+            info = (st.st_mtime_ns, st.st_size)
+            previous = self._known.get(path)
+            self._known[path] = info
+            if previous is not None and previous != info:
+                changed.append(source)
+        return changed
+
+    def _load(self, kind: str, path, kwargs: dict):
+        start = perf_counter()
+        if kind == "image":
+            item = self.assets.decode_image(
+                path, scale=kwargs.get("scale"), colorkey=kwargs.get("colorkey")
+            )
+        elif kind == "sound":
+            item = self.assets.get_sound(path)
+        else:
+            # Otherwise registry would return already parsed font
+            self.assets.font_registry.forget(path)
+            item = self.assets.get_font(path, **kwargs)
+        return item, (perf_counter() - start) * 1000
+
+    def _swap(self, kind: str, store, name: str, path, kwargs: dict, future):
+        try:
+            item, load_ms = future.result()
+        except Exception as e:
+            log.warning(f"Unable to reload {path}: {e}")
+            return
+
+        start = perf_counter()
+        if kind == "image":
+            item = self.assets.convert_image(
+                item,
+                colorkey=kwargs.get("colorkey"),
+                has_alpha=kwargs.get("has_alpha", True),
+            )
+            # Updating existing surface in place, so nodes that use it will
+            # display the new version on next frame
+            if not store.is_loaded(name):
+                store[name] = item
+            elif not replace_surface(store[name], item):
+                log.info(f"Size of {path} has changed, nodes will keep old copy")
+                store[name] = item
+        else:
+            store[name] = item
+
+        report = ReloadReport(path, name, load_ms, (perf_counter() - start) * 1000)
+        self.reports.append(report)
+        log.info(
+            f"Reloaded {path} in {report.load_ms:.2f}ms "
+            f"(+{report.swap_ms:.2f}ms on frame thread)"
+        )
+
+    def poll(self):
+        """Check watched files for changes in background"""
+
+        if self._check is not None:
+            return
+        self._check = self._executor.submit(self._find_changed, self._sources())
+
+    def update(self, ms: int = None):
+        """Process finished checks and reloads. Should be called each frame"""
+
+        self._time_left -= WGF.clock.get_time() if ms is None else ms
+        if self._time_left <= 0:
+            self._time_left = self.interval
+            self.poll()
+
+        if self._check is not None and self._check.done():
+            for kind, store, name, path, kwargs in self._check.result():
+                future = self._executor.submit(self._load, kind, path, kwargs)
+                self._pending.append((kind, store, name, path, kwargs, future))
+            self._check = None
+
+        if self._pending:
+            pending = []
+            for item in self._pending:
+                if item[-1].done():
+                    self._swap(*item)
+                else:
+                    pending.append(item)
+            self._pending = pending
+
+    def start(self, task_mgr=None, name: str = "asset_watcher"):
+        """Make provided task manager (game's one by default) update watcher"""
+
+        from WGF.tasks import Task
+
+        task_mgr = task_mgr or WGF.task_mgr
+        self._task = Task(name=name, task_method=self.update)
+        task_mgr.tasks[name] = self._task
+        # Remembering initial state of files right away
+        self.poll()
+
+    def stop(self):
+        """Stop checking files and wait for pending reloads to end"""
+
+        if self._task:
+            self._task.stop()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,476 @@
+"""Headless benchmarks of WGF's hot paths.
+
+Usage:
+    python benchmarks/bench.py run [-o results.json] [-k filter]
+    python benchmarks/bench.py compare baseline.json results.json [-t 0.1]
+"""
+
+import os
+
+# Must be set before pygame gets initialized
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import atexit
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+from dataclasses import dataclass, astuple
+from statistics import median
+from time import perf_counter
+
+import pygame
+
+# Benchmarking the checkout this script belongs to, not the installed version
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import WGF
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, number: int = 100):
+    """Register benchmark. Decorated function should do the setup and return
+    callable, which will be timed. It runs number times per each repeat.
+    """
+
+    def wrapper(func):
+        BENCHMARKS[name] = (func, number)
+        return func
+
+    return wrapper
+
+
+def _game():
+    # Nodes require initialized game, thus it has to exist before their import
+    if WGF.__dict__.get("game") is None:
+        game = WGF.GameWindow()
+        game.init()
+    return WGF.game
+
+
+@benchmark("tree_update_flat", number=50)
+def tree_update_flat(count: int = 1000):
+    _game()
+    from WGF import nodes
+    from WGF.base import SceneTree
+
+    tree = SceneTree()
+    WGF.tree = tree
+    nodes.tree = tree
+    scene = nodes.Scene("scene", pygame.Surface((1, 1)))
+    tree["scene"] = scene
+    surface = pygame.Surface((8, 8))
+    for i in range(count):
+        scene[f"node_{i}"] = nodes.VisualNode(f"node_{i}", surface, WGF.Point(i, i))
+    return tree.update
+
+
+@benchmark("tree_update_nested", number=50)
+def tree_update_nested(count: int = 1000, width: int = 10):
+    _game()
+    from WGF import nodes
+    from WGF.base import SceneTree
+
+    tree = SceneTree()
+    WGF.tree = tree
+    nodes.tree = tree
+    scene = nodes.Scene("scene", pygame.Surface((1, 1)))
+    tree["scene"] = scene
+    surface = pygame.Surface((8, 8))
+    # Each node gets attached to one of previous ones, making deep hierarchy
+    parents = [scene]
+    for i in range(count):
+        node = nodes.VisualNode(f"node_{i}", surface, WGF.Point(i, i))
+        parents[i // width][f"node_{i}"] = node
+        parents.append(node)
+    return tree.update
+
+
+@benchmark("task_manager_tasks", number=50)
+def task_manager_tasks(count: int = 1000):
+    _game()
+    from WGF.tasks import TaskManager
+
+    mgr = TaskManager()
+    for i in range(count):
+        mgr.task(f"task_{i}")(lambda: None)()
+    return mgr.update
+
+
+@benchmark("task_manager_do_later", number=50)
+def task_manager_do_later(count: int = 1000):
+    _game()
+    from WGF.tasks import TaskManager
+
+    mgr = TaskManager()
+    for i in range(count):
+        # Large delay ensures these stay in queue for the whole benchmark
+        mgr.do_later(10**9)(lambda: None)()
+    return mgr.update
+
+
+@benchmark("spritesheet_get_sprites", number=20)
+def spritesheet_get_sprites():
+    _game()
+    from WGF.loader import Spritesheet
+
+    sheet = Spritesheet(pygame.Surface((512, 512)).convert())
+    size = WGF.Size(16, 16)
+    return lambda: sheet.get_sprites(size, store=False)
+
+
+@benchmark("assets_load_images", number=1)
+def assets_load_images(count: int = 200):
+    _game()
+    directory = tempfile.mkdtemp(prefix="wgf_bench_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    img = pygame.Surface((64, 64), pygame.SRCALPHA)
+    img.fill((255, 0, 0, 128))
+    for i in range(count):
+        pygame.image.save(img, os.path.join(directory, f"img_{i}.png"))
+
+    assets = WGF.AssetsLoader(directory, image_extensions=[".png"])
+    return assets.load_images
+
+
+@benchmark("textnode_rerender", number=200)
+def textnode_rerender():
+    game = _game()
+    from WGF import nodes
+
+    node = nodes.TextNode("text", "0", game.assets.font(None, size=24))
+    counter = iter(range(10**9))
+    return lambda: setattr(node, "text", f"Score: {next(counter)}")
+
+
+@benchmark("glyph_textnode_rerender", number=200)
+def glyph_textnode_rerender():
+    game = _game()
+    from WGF import nodes
+
+    node = nodes.GlyphTextNode("text", "0", game.assets.font(None, size=24))
+    counter = iter(range(10**9))
+    return lambda: setattr(node, "text", f"Score: {next(counter)}")
+
+
+def _text_update_draw(node_type: str, size: int = 24):
+    # Text of counters and timers changes each frame, right before being drawn
+    game = _game()
+    from WGF import nodes
+
+    font = game.assets.font(None, size=size)
+    node = getattr(nodes, node_type)("text", "0", font, pos=WGF.Point(100, 100))
+    counter = iter(range(10**9))
+
+    def run():
+        node.text = f"Score: {next(counter)}"
+        node.draw()
+
+    return run
+
+
+@benchmark("textnode_update_draw", number=200)
+def textnode_update_draw():
+    return _text_update_draw("TextNode")
+
+
+@benchmark("glyph_textnode_update_draw", number=200)
+def glyph_textnode_update_draw():
+    return _text_update_draw("GlyphTextNode")
+
+
+@benchmark("textnode_update_draw_large", number=200)
+def textnode_update_draw_large():
+    return _text_update_draw("TextNode", size=64)
+
+
+@benchmark("glyph_textnode_update_draw_large", number=200)
+def glyph_textnode_update_draw_large():
+    return _text_update_draw("GlyphTextNode", size=64)
+
+
+@benchmark("convertable_indexing", number=10000)
+def convertable_indexing():
+    point = WGF.Point(10, 20)
+    size = WGF.Size(30, 40)
+    color = WGF.RGB(1, 2, 3)
+
+    def run():
+        point[0]
+        point[1]
+        x, y = size
+        tuple(color)
+
+    return run
+
+
+# Copies of dataclass-based value types WGF used before, to keep comparing
+# current ones against them
+@dataclass
+class _DataclassPoint:
+    x: int
+    y: int
+
+    def __iter__(self):
+        for var in vars(self):
+            yield getattr(self, var)
+
+    def __getitem__(self, key):
+        if type(key) is int:
+            return astuple(self)[key]
+        return vars(self)[key]
+
+
+@dataclass(frozen=True)
+class _DataclassRGB:
+    red: int = 0
+    green: int = 0
+    blue: int = 0
+
+    def __post_init__(self):
+        for i, value in vars(self).items():
+            object.__setattr__(self, i, max(min(255, value), 0))
+
+    def __iter__(self):
+        for var in vars(self):
+            yield getattr(self, var)
+
+    @classmethod
+    def from_hex(cls, color: str):
+        color = color.lstrip("#")
+        return cls(int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16))
+
+
+def _point_access(point_type):
+    point = point_type(10, 20)
+
+    def run():
+        point[0]
+        point[1]
+        x, y = point
+        pygame.Rect(point[0], point[1], 1, 1)
+
+    return run
+
+
+def _color_usage(color_type):
+    # Dataclass has no __getitem__ for colors, thus values are unpacked instead
+    def run():
+        red, green, blue = color_type.from_hex("#ff8000")
+        tuple(color_type(red, 300, -5))
+
+    return run
+
+
+@benchmark("point_access", number=10000)
+def point_access():
+    return _point_access(WGF.Point)
+
+
+@benchmark("point_access_dataclass", number=10000)
+def point_access_dataclass():
+    return _point_access(_DataclassPoint)
+
+
+@benchmark("color_usage", number=10000)
+def color_usage():
+    return _color_usage(WGF.RGB)
+
+
+@benchmark("color_usage_dataclass", number=10000)
+def color_usage_dataclass():
+    return _color_usage(_DataclassRGB)
+
+
+@benchmark("visualnode_camera_move", number=50)
+def visualnode_camera_move(count: int = 1000):
+    _game()
+    from WGF import nodes
+
+    surface = pygame.Surface((8, 8))
+    items = [
+        nodes.VisualNode(f"node_{i}", surface, WGF.Point(i, i), distance=0.5)
+        for i in range(count)
+    ]
+
+    def run():
+        for node in items:
+            node.pos = node.pos
+
+    return run
+
+
+@benchmark("point_array_camera_move", number=50)
+def point_array_camera_move(count: int = 1000):
+    _game()
+    from WGF.arrays import PointArray
+
+    points = PointArray([(i, i) for i in range(count)])
+    rects = [pygame.Rect(0, 0, 8, 8) for _ in range(count)]
+    return lambda: points.update_rects(rects, distance=0.5)
+
+
+def _moving_nodes(count: int) -> tuple:
+    from WGF import nodes
+
+    # Only nodes attached to scene tree collide. Game's tree is used, since
+    # nodes only reference their parents weakly
+    scene = nodes.Scene("moving_nodes", pygame.Surface((1, 1)))
+    _game().tree["moving_nodes"] = scene
+    rng = random.Random(0)
+    items = []
+    for i in range(count):
+        surface = pygame.Surface((rng.randint(4, 32), rng.randint(4, 32)))
+        pos = WGF.Point(rng.uniform(0, 2000), rng.uniform(0, 2000))
+        node = nodes.VisualNode(f"node_{i}", surface, pos)
+        scene[f"node_{i}"] = node
+        items.append(node)
+    steps = [(rng.uniform(-3, 3), rng.uniform(-3, 3)) for _ in range(count)]
+
+    def move():
+        for node, (x, y) in zip(items, steps):
+            node.pos = WGF.Point(node.pos.x + x, node.pos.y + y)
+
+    return items, move
+
+
+@benchmark("collision_world", number=5)
+def collision_world(count: int = 2000, pixel_perfect: bool = False):
+    _game()
+    from WGF.collision import CollisionWorld
+
+    items, move = _moving_nodes(count)
+    world = CollisionWorld()
+    for node in items:
+        world.add(node, pixel_perfect=pixel_perfect)
+
+    def run():
+        move()
+        world.update()
+
+    return run
+
+
+@benchmark("collision_world_pixel_perfect", number=5)
+def collision_world_pixel_perfect(count: int = 2000):
+    # Masks are cached on warmup run, thus this measures narrowphase itself
+    return collision_world(count, pixel_perfect=True)
+
+
+@benchmark("collision_naive", number=1)
+def collision_naive(count: int = 2000):
+    _game()
+    items, move = _moving_nodes(count)
+
+    def run():
+        move()
+        contacts = []
+        for num, a in enumerate(items, start=1):
+            for b in items[num:]:
+                if a.rect.colliderect(b.rect):
+                    contacts.append((a, b))
+
+    return run
+
+
+def run(names: list, repeats: int) -> dict:
+    results = {}
+    for name in names:
+        setup, number = BENCHMARKS[name]
+        try:
+            func = setup()
+        except ImportError as e:
+            # Benchmarks of optional features cant run without their dependencies
+            print(f"{name}: skipped ({e})")
+            continue
+        # Warming up caches and lazy initializations
+        func()
+
+        timings = []
+        for _ in range(repeats):
+            start = perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((perf_counter() - start) / number * 1000)
+
+        results[name] = {
+            "median_ms": median(timings),
+            "min_ms": min(timings),
+            "repeats": repeats,
+            "number": number,
+        }
+        print(f"{name}: {results[name]['median_ms']:.4f}ms (min {min(timings):.4f})")
+
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Get names of benchmarks that got slower than baseline by over threshold"""
+
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name}: no baseline")
+            continue
+        old = baseline["results"][name]["median_ms"]
+        new = result["median_ms"]
+        change = (new - old) / old if old else 0.0
+        status = "REGRESSION" if change > threshold else "ok"
+        print(f"{name}: {old:.4f}ms -> {new:.4f}ms ({change:+.1%}) {status}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WGF benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument("-o", "--output", help="save results to json file")
+    run_parser.add_argument("-k", "--filter", help="run benchmarks containing this")
+    run_parser.add_argument("-r", "--repeats", type=int, default=5)
+
+    compare_parser = commands.add_parser("compare", help="compare results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed slowdown, as a fraction of baseline (default: 0.1)",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
+        return
+
+    names = [i for i in BENCHMARKS if not args.filter or args.filter in i]
+    data = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+        },
+        "results": run(names, args.repeats),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,5 +21,8 @@ setup(
     install_requires=[
         "pygame==2.1.2",
     ],
-    extras_require={"toml_support": ["toml==0.10.2"]},
+    extras_require={
+        "toml_support": ["toml==0.10.2"],
+        "numpy_support": ["numpy>=1.21"],
+    },
 )
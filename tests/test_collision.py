@@ -0,0 +1,68 @@
+import gc
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import WGF
+
+
+def setUpModule():
+    # Nodes require initialized game, thus it has to exist before their import
+    if WGF.__dict__.get("game") is None:
+        WGF.GameWindow(headless=True).init()
+
+
+class SceneSwitchTest(unittest.TestCase):
+    def setUp(self):
+        from WGF import nodes
+        from WGF.base import SceneTree
+        from WGF.collision import CollisionWorld
+
+        self.nodes = nodes
+        self.tree = SceneTree()
+        self.scene = nodes.Scene("first", pygame.Surface((1, 1)))
+        self.tree.switch(self.scene)
+        self.world = CollisionWorld()
+        self.calls = []
+        for name in ("a", "b"):
+            node = nodes.VisualNode(name, pygame.Surface((8, 8)), WGF.Point(0, 0))
+            self.scene[name] = node
+            body = self.world.add(node)
+            body.entermethod(lambda other: self.calls.append(("enter", other.name)))
+            body.staymethod(lambda other: self.calls.append(("stay", other.name)))
+            body.exitmethod(lambda other: self.calls.append(("exit", other.name)))
+
+        self.world.update()
+        self.assertEqual(self.calls, [("enter", "b"), ("enter", "a")])
+        self.calls.clear()
+
+    def switch(self, stop: bool):
+        scene = self.nodes.Scene("second", pygame.Surface((1, 1)))
+        self.tree.switch(scene, stop=stop)
+
+    def test_hidden_scene(self):
+        self.switch(stop=False)
+        self.world.update()
+        self.calls.clear()
+        for _ in range(3):
+            self.world.update()
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.world.contacts, set())
+
+    def test_dropped_scene(self):
+        self.switch(stop=True)
+        self.scene = None
+        gc.collect()
+        for _ in range(3):
+            self.world.update()
+        self.assertEqual(self.calls, [])
+        self.assertEqual(len(self.world.bodies), 0)
+        self.assertEqual(self.world.contacts, set())
+        self.assertEqual(self.world._cells, {})
+
+
+if __name__ == "__main__":
+    unittest.main()